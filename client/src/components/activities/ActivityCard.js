@@ -7,6 +7,7 @@ import ActivityComments from "./ActivityComments";
 import ActivityActionButtons from "./ActivityActionButtons";
 import ActivityMediaGallery from "./ActivityMediaGallery";
 import { getApiUrl } from "../../utils/api";
+import { getImageVariantUrl } from "../../utils/images";
 
 /**
  * Displays a single activity in a card format, similar to Strava's activity feed.
@@ -124,7 +125,10 @@ function ActivityCard({ activity, activities, setActivities }) {
         <div className="activity-card-user">
           {activity.user && (
             <Link to={`/users/${activity.user.id}`}>
-              <img src={activity.user.image} alt={activity.user.username} />
+              <img
+                src={getImageVariantUrl(activity.user.image, "thumb")}
+                alt={activity.user.username}
+              />
               <span className="activity-card-username">
                 {activity.user.username}
               </span>
@@ -1,5 +1,6 @@
 import { useState, useEffect } from "react";
 import { getApiUrl } from "../../utils/api";
+import { getImageVariantUrl } from "../../utils/images";
 import "../../styling/activitycard.css";
 
 /**
@@ -147,7 +148,10 @@ function ActivityComments({ activityId, isOpen, onToggle }) {
                   <div className="comment-header">
                     <div className="comment-user-info">
                       <img
-                        src={comment.user?.image || "/default-avatar.png"}
+                        src={
+                          getImageVariantUrl(comment.user?.image, "thumb") ||
+                          "/default-avatar.png"
+                        }
                         alt={comment.user?.username || "User"}
                         className="comment-user-avatar"
                       />
@@ -2,7 +2,7 @@ import "../../styling/activitylist.css";
 
 // useState to store our activities data
 // useEffect to fetch activities from the server when the component mounts
-import { useState, useEffect, useContext } from "react";
+import { useState, useEffect, useContext, useCallback } from "react";
 import { useNavigate } from "react-router-dom";
 import { UserContext } from "../../context/UserContext";
 import { getApiUrl } from "../../utils/api";
@@ -14,8 +14,12 @@ function ActivityList() {
   // state variables to store our activities data
   const [activities, setActivities] = useState([]);
 
+  // cursor for the next page of the feed (null when there are no more pages)
+  const [nextCursor, setNextCursor] = useState(null);
+
   // state variables to store loading and error states
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
   // useNavigate to navigate to the new activity page
@@ -29,28 +33,35 @@ function ActivityList() {
     navigate("/activities/new");
   };
 
-  // useEffect to fetch activities from the server when the component mounts
-  // makes a GET request to the server to fetch all activities
-  useEffect(() => {
-    // Build URL with user_id if user is logged in
-    // If user is not logged in, fetch all activities
-    const url = user
-      ? getApiUrl(`/activities?user_id=${user.id}`)
-      : getApiUrl("/activities");
+  // fetchFeedPage to request one page of the feed, starting after the given cursor
+  // The server returns activities newest first, so no client-side sorting is needed
+  const fetchFeedPage = useCallback(
+    (cursor) => {
+      const params = new URLSearchParams();
+      // Build URL with user_id if user is logged in
+      // If user is not logged in, fetch all activities
+      if (user) params.set("user_id", user.id);
+      if (cursor) params.set("cursor", cursor);
+      const query = params.toString();
+      const url = getApiUrl(query ? `/activities?${query}` : "/activities");
 
-    fetch(url)
-      .then((response) => {
+      return fetch(url).then((response) => {
         if (!response.ok) {
           throw new Error("Failed to fetch activities");
         }
         return response.json();
-      })
+      });
+    },
+    [user]
+  );
+
+  // useEffect to fetch the first page of activities when the component mounts
+  useEffect(() => {
+    setLoading(true);
+    fetchFeedPage(null)
       .then((data) => {
-        // Sort activities by datetime (most recent first)
-        const sortedActivities = data.sort((a, b) => {
-          return new Date(b.datetime) - new Date(a.datetime);
-        });
-        setActivities(sortedActivities);
+        setActivities(data.activities);
+        setNextCursor(data.next_cursor);
       })
       .catch((error) => {
         setError(error.message);
@@ -58,7 +69,23 @@ function ActivityList() {
       .finally(() => {
         setLoading(false);
       });
-  }, [user]); // Re-fetch when user changes
+  }, [fetchFeedPage]); // Re-fetch when user changes
+
+  // handleLoadMore to append the next page of activities to the feed
+  const handleLoadMore = () => {
+    setLoadingMore(true);
+    fetchFeedPage(nextCursor)
+      .then((data) => {
+        setActivities((prev) => [...prev, ...data.activities]);
+        setNextCursor(data.next_cursor);
+      })
+      .catch((error) => {
+        setError(error.message);
+      })
+      .finally(() => {
+        setLoadingMore(false);
+      });
+  };
 
   if (loading)
     return (
@@ -97,6 +124,15 @@ function ActivityList() {
           <p>No activities found</p>
         )}
       </div>
+      {nextCursor && (
+        <button
+          className="load-more-button"
+          onClick={handleLoadMore}
+          disabled={loadingMore}
+        >
+          {loadingMore ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }
@@ -1,5 +1,6 @@
 import MapDisplay from "../shared/MapDisplay";
 import "../../styling/activitycard.css";
+import { getImageSrcSet } from "../../utils/images";
 
 /**
  * ActivityMediaGallery Component
@@ -8,6 +9,9 @@ import "../../styling/activitycard.css";
  * - Photo grid layout with responsive design
  * - Map integration when coordinates exist
  * - Image display and error handling
+ * - Right-sized, lazily loaded copies of uploaded photos
+ * - Space reserved for photos whose dimensions the server knows
+ * - Blurred placeholder and dominant color while photos load
  * - Conditional rendering based on media availability
  *
  * @param {Object} props
@@ -23,6 +27,13 @@ function ActivityMediaGallery({ activity }) {
       : activity.photos.split(",").filter((url) => url.trim())
     : [];
 
+  // Prefer the server's per-photo details: their dimensions let the browser
+  // reserve each photo's space before it loads
+  const photoItems =
+    activity.photo_items && activity.photo_items.length > 0
+      ? activity.photo_items
+      : photoArray.map((url) => ({ url }));
+
   // Don't render anything if no photos and no map
   if (photoArray.length === 0 && (!activity.latitude || !activity.longitude)) {
     return null;
@@ -56,10 +67,25 @@ function ActivityMediaGallery({ activity }) {
             )}
 
             {/* Then the existing photos */}
-            {photoArray.map((photo, index) => (
-              <div key={index} className="photo-grid-item">
+            {photoItems.map((photo, index) => (
+              <div
+                key={index}
+                className="photo-grid-item"
+                style={{
+                  // Shown until the photo itself arrives
+                  backgroundColor: photo.dominant_color || undefined,
+                  backgroundImage: photo.placeholder
+                    ? `url(${photo.placeholder})`
+                    : undefined,
+                }}
+              >
                 <img
-                  src={photo}
+                  src={photo.url}
+                  srcSet={getImageSrcSet(photo.url, photo.variants)}
+                  sizes="(max-width: 600px) 100vw, 600px"
+                  width={photo.width || undefined}
+                  height={photo.height || undefined}
+                  loading="lazy"
                   alt={`${activity.title} - ${index + 1}`}
                   onError={(e) => {
                     e.target.style.display = "none";
@@ -11,7 +11,7 @@ import "../../styling/usersearch.css";
  * Displays search results with follow/unfollow functionality
  *
  * Features:
- * - Search input with real-time results
+ * - Username suggestions while typing, full search on submit
  * - User cards with follow/unfollow buttons
  * - Loading states and error handling
  * - Responsive design
@@ -20,7 +20,10 @@ function UserSearch() {
   const { user: currentUser } = useContext(UserContext);
   const navigate = useNavigate();
   const [searchTerm, setSearchTerm] = useState("");
+  // The term the results are for; set on submit so typing only fetches suggestions
+  const [submittedTerm, setSubmittedTerm] = useState("");
   const [searchResults, setSearchResults] = useState([]);
+  const [suggestions, setSuggestions] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
 
@@ -47,7 +50,9 @@ function UserSearch() {
           throw new Error("Failed to fetch users");
         }
 
-        const results = await response.json();
+        // The directory is paginated; show the first page
+        const data = await response.json();
+        const results = data.users;
         // Filter out the current user from the results
         const filteredResults = currentUser
           ? results.filter(
@@ -99,6 +104,34 @@ function UserSearch() {
     }
   }, [currentUser]);
 
+  /**
+   * Username suggestions while typing, served from the server's in-memory index
+   */
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSuggestions([]);
+      return;
+    }
+
+    const controller = new AbortController();
+    const timeoutId = setTimeout(() => {
+      fetch(getApiUrl(`/users/autocomplete?q=${encodeURIComponent(term)}`), {
+        signal: controller.signal,
+      })
+        .then((response) => (response.ok ? response.json() : []))
+        .then((results) => setSuggestions(results))
+        .catch(() => {
+          // Suggestions are best-effort; aborted or failed requests are ignored
+        });
+    }, 150); // Wait 150ms after user stops typing
+
+    return () => {
+      clearTimeout(timeoutId);
+      controller.abort();
+    };
+  }, [searchTerm]);
+
   /**
    * Handles follow/unfollow actions
    */
@@ -140,15 +173,31 @@ function UserSearch() {
   };
 
   /**
-   * Debounced search effect
+   * Handles typing in the search input
    */
-  useEffect(() => {
-    const timeoutId = setTimeout(() => {
-      searchUsers(searchTerm);
-    }, 300); // Wait 300ms after user stops typing
+  const handleSearchChange = (e) => {
+    const value = e.target.value;
+    setSearchTerm(value);
+    // Clearing the input brings the directory back; picking a suggestion searches for it
+    if (!value.trim() || suggestions.some((s) => s.username === value)) {
+      setSubmittedTerm(value);
+    }
+  };
+
+  /**
+   * Runs the full search when the form is submitted
+   */
+  const handleSearchSubmit = (e) => {
+    e.preventDefault();
+    setSubmittedTerm(searchTerm);
+  };
 
-    return () => clearTimeout(timeoutId);
-  }, [searchTerm, searchUsers]);
+  /**
+   * Search effect, once per submitted term
+   */
+  useEffect(() => {
+    searchUsers(submittedTerm);
+  }, [submittedTerm, searchUsers]);
 
   // When /me finishes after load, refetch once so lists and follow state match the session
   const lastSyncedUserId = useRef(null);
@@ -160,8 +209,8 @@ function UserSearch() {
     }
     if (lastSyncedUserId.current === uid) return;
     lastSyncedUserId.current = uid;
-    searchUsers(searchTerm);
-  }, [currentUser, searchUsers]); // searchTerm read from latest closure when user id first appears
+    searchUsers(submittedTerm);
+  }, [currentUser, searchUsers]); // submittedTerm read from latest closure when user id first appears
 
   const isSelf = (other) =>
     currentUser != null &&
@@ -182,25 +231,36 @@ function UserSearch() {
       </div>
 
       {/* Search Input */}
-      <div className="search-input-container">
+      <form
+        className="search-input-container"
+        role="search"
+        onSubmit={handleSearchSubmit}
+      >
         <label htmlFor="search-input" className="sr-only">
           Search users
         </label>
         <input
           type="text"
           id="search-input"
-          placeholder="Search by username..."
+          placeholder="Search by username and press Enter..."
           value={searchTerm}
-          onChange={(e) => setSearchTerm(e.target.value)}
+          onChange={handleSearchChange}
           className="search-input"
           aria-describedby="search-help"
+          list="username-suggestions"
+          autoComplete="off"
         />
+        <datalist id="username-suggestions">
+          {suggestions.map((suggestion) => (
+            <option key={suggestion.id} value={suggestion.username} />
+          ))}
+        </datalist>
         {isLoading && (
           <div className="search-loading" aria-live="polite">
             Searching...
           </div>
         )}
-      </div>
+      </form>
 
       {/* Error Display */}
       {error && (
@@ -294,9 +354,9 @@ function UserSearch() {
               </div>
             </div>
           ))
-        ) : searchTerm.trim() && !isLoading ? (
+        ) : submittedTerm.trim() && !isLoading ? (
           <div className="no-results" role="status" aria-live="polite">
-            <p>No users found matching "{searchTerm}"</p>
+            <p>No users found matching "{submittedTerm}"</p>
           </div>
         ) : null}
       </div>
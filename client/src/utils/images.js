@@ -0,0 +1,39 @@
+// I mirror the server's IMAGE_VARIANTS so the browser can pick a right-sized copy of an upload
+export const IMAGE_VARIANTS = {
+  thumb: 320,
+  medium: 800,
+};
+
+// Uploads are stored at most this wide (the server's max_dim)
+const FULL_IMAGE_WIDTH = 1600;
+
+// Helper function to check whether an image was uploaded to our server (only those have variants)
+const isUploadedImage = (url) =>
+  typeof url === "string" && url.includes("/uploads/") && !url.includes("?");
+
+// Helper function to get the URL of a smaller variant of an uploaded image
+export const getImageVariantUrl = (url, size) => {
+  if (!isUploadedImage(url) || !IMAGE_VARIANTS[size]) {
+    return url;
+  }
+  return `${url}?size=${size}`;
+};
+
+// Helper function to build a srcSet so the browser downloads the smallest copy that fits
+// Uses the variants the server reports for a photo when it has them
+export const getImageSrcSet = (url, variants) => {
+  if (variants) {
+    return Object.values(variants)
+      .filter((variant) => variant.width)
+      .map((variant) => `${variant.url} ${variant.width}w`)
+      .join(", ");
+  }
+  if (!isUploadedImage(url)) {
+    return undefined;
+  }
+  const candidates = Object.entries(IMAGE_VARIANTS).map(
+    ([size, width]) => `${getImageVariantUrl(url, size)} ${width}w`
+  );
+  candidates.push(`${url} ${FULL_IMAGE_WIDTH}w`);
+  return candidates.join(", ");
+};
@@ -2,11 +2,14 @@
 
 # Standard library imports
 from datetime import datetime, timedelta, timezone
+import base64
+import binascii
+import json
 import os
-import uuid
+from pathlib import Path
 
 # Remote library imports
-from flask import request, make_response, current_app, send_from_directory
+from flask import request, make_response, send_file
 from flask_jwt_extended import (
     jwt_required,
     get_jwt_identity,
@@ -15,51 +18,312 @@ from flask_jwt_extended import (
 )
 from flask_restful import Resource
 from flask_jwt_extended.exceptions import JWTExtendedException
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 
 
 # Local imports
-from config import app, db, api
-from sqlalchemy import select
-from utils.image_utils import optimize_image_file_in_place
+from config import app, db, api, env_int, env_str
+from sqlalchemy import select, func, tuple_, update, exists, literal
+from sqlalchemy.orm import selectinload
+import timeline
+from search import get_user_search_backend
+from autocomplete import username_index, get_username_index
+from image_jobs import (
+    get_image_job,
+    check_upload_size,
+    get_alternate_formats,
+    IMAGE_VARIANTS,
+)
+from uploads import store_upload, adjust_upload_refs, prepare_activity_photos, sync_activity_photos, InvalidPhoto
+from storage import get_upload_storage, guess_content_type
+from passwords import PasswordHashBusy, RETRY_AFTER_SECONDS
+from db_pool import pool_status, check_database
+from release import run_migrations
+from utils.image_utils import OUTPUT_FORMATS, ImageTooLarge, format_path, variant_path
 
 
 # Model imports
-from models import User, Activity, Comment, Like, Follow
+from models import User, Activity, ActivityPhoto, Comment, Like, Follow, UploadBlob, find_unindexed_relationship_columns
+
+# Warn at startup about relationship lookups that would fall back to sequential scans
+for column_name in find_unindexed_relationship_columns():
+    app.logger.warning(f"No index on {column_name}; relationship loads filtering on it will scan the table")
+
+# Helper function to build the fan-out-on-read feed query
+def select_activity_page(author_ids, cursor, limit):
+    """Select activities by `author_ids` (everyone when None), newest first, starting after `cursor`"""
+    stmt = (
+        select(Activity)
+        .options(selectinload(Activity.user))
+        .order_by(Activity.datetime.desc(), Activity.id.desc())
+        .limit(limit)
+    )
+    if author_ids is not None:
+        stmt = stmt.where(Activity.user_id.in_(author_ids))
+    if cursor:
+        stmt = stmt.where(tuple_(Activity.datetime, Activity.id) < cursor)
+    return stmt
+
+# Helper function to read the home feed from the materialized timeline
+def get_timeline_activities(user_id, following_ids, cursor, limit):
+    """Get up to `limit` home feed activities from the user's timeline.
+
+    High-fanout authors are merged in at read time, and once the timeline
+    runs out the feed continues straight from the activities table.
+    """
+    stmt = timeline.select_timeline_page(user_id, cursor, limit).options(selectinload(Activity.user))
+    activities = list(db.session.execute(stmt).scalars())
+
+    if len(activities) < limit:
+        # Older than anything kept in the timeline, so fall back to fan-out on read
+        tail_cursor = (activities[-1].datetime, activities[-1].id) if activities else cursor
+        tail_stmt = select_activity_page(following_ids, tail_cursor, limit - len(activities))
+        activities.extend(db.session.execute(tail_stmt).scalars())
+
+    high_fanout_ids = timeline.high_fanout_author_ids(following_ids)
+    if high_fanout_ids:
+        activities.extend(db.session.execute(select_activity_page(high_fanout_ids, cursor, limit)).scalars())
+
+    unique_activities = {activity.id: activity for activity in activities}
+    ordered = sorted(unique_activities.values(), key=lambda activity: (activity.datetime, activity.id), reverse=True)
+    return ordered[:limit]
+
+# Helper function to move an activity's denormalized counters
+def adjust_activity_counter(activity_id, column, delta):
+    """Atomically add `delta` to one of an activity's counter columns within the current transaction"""
+    counter = getattr(Activity, column)
+    db.session.execute(
+        update(Activity)
+        .where(Activity.id == activity_id)
+        .values({column: counter + delta})
+    )
+
+# Helper function to move a user's denormalized follower counter
+def adjust_follower_count(user_ids, delta):
+    """Atomically add `delta` to the follower_count of each of `user_ids` within the current transaction"""
+    db.session.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(follower_count=User.follower_count + delta),
+        execution_options={'synchronize_session': False}
+    )
+
+# Helper function to rebuild the denormalized follower counters from the follows table
+def recount_follower_counts():
+    """Recompute follower_count for every user in a single statement"""
+    follower_total = (
+        select(func.count(Follow.id))
+        .where(Follow.followed_id == User.id)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(User).values(follower_count=follower_total),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+# Helper function to rebuild the denormalized counters from the source tables
+def recount_activity_counters():
+    """Recompute like_count and comment_count for every activity in a single statement"""
+    like_total = (
+        select(func.count(Like.id))
+        .where(Like.activity_id == Activity.id)
+        .scalar_subquery()
+    )
+    comment_total = (
+        select(func.count(Comment.id))
+        .where(Comment.activity_id == Activity.id)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(Activity).values(like_count=like_total, comment_count=comment_total),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+@app.cli.command('repair-counters')
+def repair_counters_command():
+    """Recompute the denormalized like and comment counters on activities and follower counters on users."""
+    updated = recount_activity_counters()
+    users = recount_follower_counts()
+    db.session.commit()
+    print(f"Recomputed counters for {updated} activities and {users} users.")
+
+# Fields every user directory entry shares across /users and /users/search
+USER_DIRECTORY_FIELDS = ('id', 'username', 'email', 'image', 'location', 'bio')
+
+# Directory page size used when the client does not ask for one, and the most it may ask for
+USER_DIRECTORY_DEFAULT_LIMIT = 50
+USER_DIRECTORY_MAX_LIMIT = 200
+
+# Helper function to identify the viewer from an optional Authorization header
+def get_optional_viewer_id():
+    """Return the logged-in user's ID if a valid JWT was sent, otherwise None"""
+    if not request.headers.get('Authorization'):
+        return None
+    try:
+        verify_jwt_in_request()
+        current_user_id = get_jwt_identity()
+    except Exception:
+        # If JWT is invalid, just continue without user context
+        return None
+    # Normalize types from JWT
+    return int(current_user_id) if current_user_id is not None else None
+
+# Helper function to build the user directory query
+def select_user_directory(viewer_id=None):
+    """Select users with their activity count, follower count and the viewer's follow status in one query"""
+    activity_count = (
+        select(func.count(Activity.id))
+        .where(Activity.user_id == User.id)
+        .scalar_subquery()
+    )
+    if viewer_id:
+        is_following = exists().where(
+            Follow.follower_id == viewer_id,
+            Follow.followed_id == User.id
+        )
+    else:
+        is_following = literal(False)
+
+    return select(
+        User,
+        activity_count.label('activity_count'),
+        User.follower_count,
+        is_following.label('is_following'),
+    )
+
+# Helper function to serialize user directory rows
+def serialize_user_directory(rows, viewer_id=None):
+    """Turn (user, activity count, follower count, is following) rows into response dicts"""
+    response_body = []
+    for user, activity_count, follower_count, is_following in rows:
+        user_dict = user.to_dict(only=USER_DIRECTORY_FIELDS)
+        user_dict['activities'] = activity_count
+        user_dict['followers'] = follower_count
+        user_dict['isFollowing'] = bool(is_following) and viewer_id != user.id
+        response_body.append(user_dict)
+    return response_body
+
+# Fields every activity payload shares across the feed, profile and detail views
+ACTIVITY_FEED_FIELDS = ('id', 'title', 'activity_type', 'description', 'latitude', 'longitude', 'location_name', 'datetime', 'elapsed_time', 'photos', 'user')
+
+# Number of liker avatars included with each activity
+LIKE_PREVIEW_LIMIT = 5
+
+# Helper function to describe one activity photo for the client
+def serialize_activity_photo(photo):
+    """Return a photo's URL, dimensions, size, variant URLs and placeholder so the client can reserve space and pick a size"""
+    variants = None
+    if photo.variants:
+        variants = {
+            name: {"url": f"{photo.url}?size={name}", "width": width}
+            for name, width in photo.variants.items()
+        }
+        variants["full"] = {"url": photo.url, "width": photo.width}
+    return {
+        'url': photo.url,
+        'width': photo.width,
+        'height': photo.height,
+        'bytes': photo.bytes,
+        'variants': variants,
+        'placeholder': photo.placeholder,
+        'dominant_color': photo.dominant_color,
+    }
+
+# Helper function to get like information for many activities at once
+def get_activities_with_likes(activities, current_user_id=None):
+    """Get activity data including like counts, liker previews, photos and the viewer's like status.
+
+    Counts come from the denormalized activity columns; likers, photos and
+    the viewer's status are resolved for the whole batch with a fixed number
+    of grouped queries, no matter how many activities are passed in.
+    """
+    activities = list(activities)
+    activity_ids = [activity.id for activity in activities]
+    if not activity_ids:
+        return []
+
+    # First few likers per activity, joined to their user row in the same query
+    ranked_likes = (
+        select(
+            Like.activity_id.label('activity_id'),
+            Like.user_id.label('user_id'),
+            func.row_number().over(
+                partition_by=Like.activity_id,
+                order_by=Like.id
+            ).label('position'),
+        )
+        .where(Like.activity_id.in_(activity_ids))
+        .subquery()
+    )
+    preview_stmt = (
+        select(ranked_likes.c.activity_id, User.id, User.username, User.image)
+        .join(User, User.id == ranked_likes.c.user_id)
+        .where(ranked_likes.c.position <= LIKE_PREVIEW_LIMIT)
+        .order_by(ranked_likes.c.activity_id, ranked_likes.c.position)
+    )
+    like_users = {}
+    for activity_id, user_id, username, image in db.session.execute(preview_stmt):
+        like_users.setdefault(activity_id, []).append({
+            'id': user_id,
+            'username': username,
+            'image': image
+        })
+
+    # Activities the current user has liked
+    liked_ids = set()
+    if current_user_id:
+        liked_stmt = select(Like.activity_id).where(
+            Like.user_id == current_user_id,
+            Like.activity_id.in_(activity_ids)
+        )
+        liked_ids = set(db.session.execute(liked_stmt).scalars())
+
+    # Every activity's photos, in display order
+    photo_items = {}
+    photos_stmt = (
+        select(ActivityPhoto)
+        .where(ActivityPhoto.activity_id.in_(activity_ids))
+        .order_by(ActivityPhoto.activity_id, ActivityPhoto.position)
+    )
+    for photo in db.session.execute(photos_stmt).scalars():
+        photo_items.setdefault(photo.activity_id, []).append(serialize_activity_photo(photo))
+
+    response_body = []
+    for activity in activities:
+        activity_dict = activity.to_dict(only=ACTIVITY_FEED_FIELDS)
+        activity_dict['like_count'] = activity.like_count or 0
+        activity_dict['comment_count'] = activity.comment_count or 0
+        activity_dict['like_users'] = like_users.get(activity.id, [])
+        activity_dict['user_liked'] = activity.id in liked_ids
+        activity_dict['photo_items'] = photo_items.get(activity.id, [])
+        response_body.append(activity_dict)
+
+    return response_body
+
+# Feed page size used when the client does not ask for one, and the most it may ask for
+FEED_DEFAULT_LIMIT = 20
+FEED_MAX_LIMIT = 100
+
+# Helper functions for the opaque (datetime, id) feed cursor
+def encode_feed_cursor(activity):
+    """Encode the sort key of the last activity on a page as an opaque cursor"""
+    payload = json.dumps([activity.datetime.isoformat(), activity.id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_feed_cursor(cursor):
+    """Decode a feed cursor back into its (datetime, id) pair, raising ValueError if it is malformed"""
+    try:
+        datetime_str, activity_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(datetime_str), int(activity_id)
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
 
 # Helper function to get activity data with like information
 def get_activity_with_likes(activity, current_user_id=None):
     """Get activity data including like count and user's like status"""
-    activity_dict = activity.to_dict(only=('id', 'title', 'activity_type', 'description', 'latitude', 'longitude', 'location_name', 'datetime', 'elapsed_time', 'photos', 'user'))
-    
-    # Get likes with user information
-    likes = Like.query.filter_by(activity_id=activity.id).all()
-    like_count = len(likes)
-    activity_dict['like_count'] = like_count
-    
-    # Get user information for likes (limit to 5 for display)
-    like_users = []
-    for like in likes[:5]:  # Limit to 5 users for display
-        user = db.session.get(User, like.user_id)
-        if user:
-            like_users.append({
-                'id': user.id,
-                'username': user.username,
-                'image': user.image
-            })
-    activity_dict['like_users'] = like_users
-    
-    # Check if current user has liked this activity
-    if current_user_id:
-        user_liked = Like.query.filter_by(
-            user_id=current_user_id, 
-            activity_id=activity.id
-        ).first() is not None
-        activity_dict['user_liked'] = user_liked
-    else:
-        activity_dict['user_liked'] = False
-    
-    return activity_dict
+    return get_activities_with_likes([activity], current_user_id)[0]
 
 
 # Views go here!
@@ -69,10 +333,150 @@ def get_activity_with_likes(activity, current_user_id=None):
 def index():
     return '<h1>Still Strava API</h1><p>Backend is running!</p>'
 
+# Database health route - answers load balancer checks and shows this worker's connection pool
+@app.route('/health/db')
+def database_health():
+    ok, latency_ms = check_database()
+    response_body = {
+        'database': 'ok' if ok else 'unavailable',
+        'latency_ms': latency_ms,
+        'pool': pool_status()
+    }
+    return make_response(response_body, 200 if ok else 503)
+
+# Finished uploads are cached by browsers and CDNs for a year
+UPLOAD_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Helper function to list the size variants of an upload for the client
+def get_upload_variants(image_url):
+    """Map each variant name to its URL and max dimension, plus the full-size original"""
+    variants = {
+        name: {"url": f"{image_url}?size={name}", "width": max_dim}
+        for name, max_dim in IMAGE_VARIANTS.items()
+    }
+    variants["full"] = {"url": image_url}
+    return variants
+
+# Helper function to add what optimization learned about an upload to an upload response
+def add_upload_metadata(response_body, filename):
+    """Add the optimized image's size and placeholder, once they are known"""
+    blob = UploadBlob.query.filter_by(filename=filename).first()
+    if blob and blob.width:
+        response_body["width"] = blob.width
+        response_body["height"] = blob.height
+        response_body["placeholder"] = blob.placeholder
+        response_body["dominantColor"] = blob.dominant_color
+    return response_body
+
+# Helper function to pick which stored copy of an upload to send
+def negotiate_upload_filename(filename, size=None):
+    """Return the stored file for `filename` at `size`, in the best format the client's Accept header allows"""
+    storage = get_upload_storage()
+    if size in IMAGE_VARIANTS:
+        variant_filename = str(variant_path(Path(filename), size))
+        if storage.exists(variant_filename):
+            filename = variant_filename
+
+    # Only formats the client names explicitly count; */* alone means it may not decode them
+    accepted = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+    for fmt in get_alternate_formats():
+        if OUTPUT_FORMATS[fmt].mimetype in accepted:
+            alternate_filename = str(format_path(Path(filename), fmt))
+            if storage.exists(alternate_filename):
+                return alternate_filename
+    return filename
+
+# Helper function to check whether an upload's bytes can still change
+def upload_is_final(filename):
+    """True once background optimization has written `filename` and its variants; a failed job never finishes them"""
+    job = get_image_job(filename)
+    return job is None or job.status == 'done'
+
+# Helper function to hand the file transfer to the front proxy (nginx X-Accel-Redirect)
+def accel_redirect_response(stored_filename):
+    """Return an empty response telling the proxy which internal location to serve"""
+    response = make_response('', 200)
+    response.headers['X-Accel-Redirect'] = f"{app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/')}/{stored_filename}"
+    response.mimetype = guess_content_type(stored_filename)
+    return response
+
+# Helper function to stream an upload out of remote blob storage
+def stream_remote_upload(storage, stored_filename):
+    """Relay an object from storage, passing any Range header through to it"""
+    try:
+        stored_object = storage.open(stored_filename, request.headers.get('Range'))
+    except RequestedRangeNotSatisfiable as e:
+        return make_response({"error": e.description}, 416)
+    response = app.response_class(
+        stored_object['Body'].iter_chunks(1 << 16),
+        mimetype=stored_object.get('ContentType') or guess_content_type(stored_filename),
+        direct_passthrough=True
+    )
+    response.content_length = stored_object['ContentLength']
+    response.accept_ranges = 'bytes'
+    if stored_object.get('ContentRange'):
+        response.status_code = 206
+        response.headers['Content-Range'] = stored_object['ContentRange']
+    return response
+
 # Serve uploaded files
+# ?size=thumb (or any IMAGE_VARIANTS name) serves that smaller copy once it exists,
+# and browsers that accept AVIF/WebP get those encodings when they are stored.
+# Finished uploads never change (their names are content hashes), so browsers may cache them for good.
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory('uploads', filename)
+    storage = get_upload_storage()
+    size = request.args.get('size')
+    stored_filename = negotiate_upload_filename(filename, size)
+    source_filename = None
+    if not storage.exists(stored_filename):
+        # Until optimization writes the upload, its original is kept under its own format's extension
+        job = get_image_job(filename)
+        source_filename = job.source_filename if job else None
+        if not source_filename or not storage.exists(source_filename):
+            return make_response({"error": "File not found"}, 404)
+        stored_filename = source_filename
+
+    # Until optimization finishes, or while a requested size is missing, the bytes at this URL can still change
+    final = source_filename is None and upload_is_final(filename) and (size not in IMAGE_VARIANTS or Path(stored_filename).stem.endswith(f".{size}"))
+    etag = stored_filename if final else None
+
+    local_path = storage.local_path(stored_filename)
+    if etag and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+    elif app.config['UPLOAD_SENDFILE_MODE'] == 'x-accel':
+        response = accel_redirect_response(stored_filename)
+        if etag:
+            response.set_etag(etag)
+    elif local_path:
+        # send_file answers If-None-Match/If-Modified-Since with 304 and Range with 206;
+        # with USE_X_SENDFILE it only sets X-Sendfile and the proxy sends the bytes
+        response = send_file(
+            local_path,
+            etag=etag or True,
+            max_age=UPLOAD_CACHE_MAX_AGE if final else None
+        )
+    else:
+        response = stream_remote_upload(storage, stored_filename)
+        if etag:
+            response.set_etag(etag)
+
+    if final:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = UPLOAD_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    if get_alternate_formats():
+        response.vary.add('Accept')
+    return response
+
+# Helper function to turn away password requests while hashing is saturated
+def password_busy_response(error):
+    """A 429 telling the client when to retry"""
+    return make_response({"error": str(error)}, 429, {"Retry-After": str(RETRY_AFTER_SECONDS)})
 
 # Login route
 # I let the client exchange email/password for a JWT here so every other request knows who the user is
@@ -90,8 +494,20 @@ class Login(Resource):
         if not user:
             return {'error': 'No account found with this email address'}, 401
         
-        if not user.authenticate(password):
-            return {'error': 'Incorrect password'}, 401
+        try:
+            if not user.authenticate(password):
+                return {'error': 'Incorrect password'}, 401
+        except PasswordHashBusy as e:
+            return password_busy_response(e)
+
+        # Bring hashes made with an older bcrypt cost up to date while we have the password;
+        # best effort, so a busy hash pool just leaves it for the next login
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+            except PasswordHashBusy:
+                pass
     
         # Generate JWT token
         token = create_access_token(identity=user.id)
@@ -123,10 +539,15 @@ class Signup(Resource):
             user = User(username=username, email=email, image=image)
             user.set_password(password)
             db.session.add(user)
+            adjust_upload_refs(None, image)
             db.session.commit()
+        except PasswordHashBusy as e:
+            return password_busy_response(e)
         except Exception as e:
             return {'error': str(e)}, 400
 
+        username_index.add(user.id, user.username)
+
         token = create_access_token(identity=user.id)
 
         return {
@@ -158,7 +579,7 @@ class RequestPasswordReset(Resource):
         
         # For now, we'll return the token in the response
         # In production, you'd send this via email
-        reset_link = f"{os.environ.get('FRONTEND_URL', 'http://localhost:3000')}/reset-password?token={reset_token}"
+        reset_link = f"{env_str('FRONTEND_URL', 'http://localhost:3000')}/reset-password?token={reset_token}"
         
         return {
             'message': 'Password reset link sent to your email',
@@ -192,7 +613,10 @@ class ResetPassword(Resource):
             return {'error': 'Invalid or expired reset token'}, 400
         
         # Update password and clear reset token
-        user.set_password(new_password)
+        try:
+            user.set_password(new_password)
+        except PasswordHashBusy as e:
+            return password_busy_response(e)
         user.clear_reset_token()
         db.session.commit()
         
@@ -217,40 +641,26 @@ api.add_resource(Me, '/me')
 # I expose the public directory here and sprinkle in follow stats so discovery feels social out of the box
 class AllUsers(Resource):
     def get(self):
-        stmt = select(User)
-        result = db.session.execute(stmt)
-        users = result.scalars().all()
-        
         # Get current user to check follow status
-        current_user_id = None
-        if request.headers.get('Authorization'):
-            try:
-                from flask_jwt_extended import verify_jwt_in_request
-                verify_jwt_in_request()
-                current_user_id = get_jwt_identity()
-            except Exception as e:
-                # If JWT is invalid, just continue without user context
-                current_user_id = None
-        
-        response_body = []
-        for user in users:
-            user_dict = user.to_dict(only=('id', 'username', 'email', 'image', 'location', 'bio'))
-            
-            # Add activity and follower counts
-            user_dict['activities'] = len(user.activities)
-            user_dict['followers'] = len(user.followers)
-            
-            # Check if current user is following this user
-            if current_user_id and current_user_id != user.id:
-                is_following = Follow.query.filter_by(
-                    follower_id=current_user_id,
-                    followed_id=user.id
-                ).first() is not None
-                user_dict['isFollowing'] = is_following
-            else:
-                user_dict['isFollowing'] = False
-            
-            response_body.append(user_dict)
+        current_user_id = get_optional_viewer_id()
+
+        # Page through users in ID order; the cursor is the last ID already returned
+        limit = request.args.get('limit', USER_DIRECTORY_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, USER_DIRECTORY_MAX_LIMIT))
+        cursor = request.args.get('cursor', type=int)
+
+        stmt = select_user_directory(current_user_id).order_by(User.id).limit(limit + 1)
+        if cursor:
+            stmt = stmt.where(User.id > cursor)
+        rows = db.session.execute(stmt).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        response_body = {
+            'users': serialize_user_directory(rows, current_user_id),
+            'next_cursor': rows[-1][0].id if has_more else None
+        }
         
         return make_response(response_body, 200)
     
@@ -267,9 +677,13 @@ class AllUsers(Resource):
             )
             new_user.set_password(password)
             db.session.add(new_user)
+            adjust_upload_refs(None, new_user.image)
             db.session.commit()
+            username_index.add(new_user.id, new_user.username)
             response_body = new_user.to_dict(only=('id', 'username', 'email', 'image'))
             return make_response(response_body, 201)
+        except PasswordHashBusy as e:
+            return password_busy_response(e)
         except Exception as e:
             response_body = {
                 "error": str(e)
@@ -292,13 +706,8 @@ class UserById(Resource):
                 'comments', 'followers', 'following'
             ))
             
-            # Process activities with like information
-            activities_with_likes = []
-            for activity in user.activities:
-                activity_with_likes = get_activity_with_likes(activity, current_user_id)
-                activities_with_likes.append(activity_with_likes)
-            
-            response_body['activities'] = activities_with_likes
+            # Process activities with like information in one batch
+            response_body['activities'] = get_activities_with_likes(user.activities, current_user_id)
             
             return make_response(response_body, 200)
         else:
@@ -316,9 +725,13 @@ class UserById(Resource):
         user = db.session.get(User, id)
         if user:
             try:
+                old_username = user.username
+                old_image = user.image
                 for attr in request.json:
                     setattr(user, attr, request.json[attr])
+                adjust_upload_refs(old_image, user.image)
                 db.session.commit()
+                username_index.rename(user.id, old_username, user.username)
                 response_body = user.to_dict(only=USER_PROFILE_FIELDS)
                 return make_response(response_body, 200)
             except Exception as e:
@@ -335,8 +748,13 @@ class UserById(Resource):
     def delete(self, id):
         user = db.session.get(User, id)
         if user:
+            timeline.remove_user(user.id)
+            # Their follows go with them
+            adjust_follower_count(select(Follow.followed_id).where(Follow.follower_id == user.id), -1)
+            adjust_upload_refs(user.image, None)
             db.session.delete(user)
             db.session.commit()
+            username_index.remove(user.id, user.username)
             return make_response({}, 204)
         else:
             response_body = {
@@ -370,6 +788,8 @@ class FollowUser(Resource):
             
             follow = Follow(follower_id=current_user_id, followed_id=user_id)
             db.session.add(follow)
+            adjust_follower_count([user_id], 1)
+            timeline.backfill_follow(current_user_id, user_id)
             db.session.commit()
             return make_response({"message": "Followed successfully."}, 201)
         except Exception as e:
@@ -387,6 +807,8 @@ class UnfollowUser(Resource):
         if not follow:
             return make_response({"error": "Not following."}, 400)
         db.session.delete(follow)
+        adjust_follower_count([user_id], -1)
+        timeline.prune_follow(current_user_id, user_id)
         db.session.commit()
         return make_response({"message": "Unfollowed successfully."}, 200)
 
@@ -420,45 +842,34 @@ class UserSearch(Resource):
         if not query:
             return make_response([], 200)
         
-        # Search users by username (case-insensitive)
-        users = User.query.filter(
-            User.username.ilike(f'%{query}%')
-        ).limit(20).all()  # Limit results to 20 users
-        
-        # Get current user to check follow status (must verify JWT before get_jwt_identity)
-        current_user_id = None
-        if request.headers.get('Authorization'):
-            try:
-                verify_jwt_in_request()
-                current_user_id = get_jwt_identity()
-            except Exception:
-                current_user_id = None
-
-        results = []
-        for user in users:
-            user_dict = user.to_dict(only=('id', 'username', 'email', 'image', 'location', 'bio'))
-            
-            # Add activity and follower counts (using len() to avoid serialization issues)
-            user_dict['activities'] = len(user.activities)
-            user_dict['followers'] = len(user.followers)
-            
-            # Check if current user is following this user (normalize types from JWT)
-            viewer_id = int(current_user_id) if current_user_id is not None else None
-            if viewer_id is not None and viewer_id != user.id:
-                is_following = Follow.query.filter_by(
-                    follower_id=viewer_id,
-                    followed_id=user.id
-                ).first() is not None
-                user_dict['isFollowing'] = is_following
-            else:
-                user_dict['isFollowing'] = False
-            
-            results.append(user_dict)
+        # Get current user to check follow status
+        current_user_id = get_optional_viewer_id()
+
+        # Search users by username, location and bio, best matches first
+        stmt = get_user_search_backend().apply(select_user_directory(current_user_id), query)
+        stmt = stmt.limit(20)  # Limit results to 20 users
+        rows = db.session.execute(stmt).all()
+
+        results = serialize_user_directory(rows, current_user_id)
         
         return make_response(results, 200)
 
 api.add_resource(UserSearch, '/users/search')
 
+# I answer search-as-you-type from an in-memory username index so keystrokes never hit the database
+class UserAutocomplete(Resource):
+    def get(self):
+        prefix = request.args.get('q', '').strip()
+        limit = max(1, min(request.args.get('limit', 10, type=int), 25))
+
+        if not prefix:
+            return make_response([], 200)
+
+        matches = get_username_index().complete(prefix, limit)
+        return make_response([{'id': user_id, 'username': username} for user_id, username in matches], 200)
+
+api.add_resource(UserAutocomplete, '/users/autocomplete')
+
 # File upload endpoint
 # I handle media uploads here, validating file type and storing locally for now so activity photos feel instant
 class UploadImage(Resource):
@@ -476,45 +887,72 @@ class UploadImage(Resource):
             allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
             if not file.filename.lower().endswith(tuple('.' + ext for ext in allowed_extensions)):
                 return make_response({"error": "Invalid file type. Please upload an image."}, 400)
-            
-            # Create uploads directory if it doesn't exist
-            upload_folder = 'uploads'
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-            
-            # Generate unique filename
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            file_path = os.path.join(upload_folder, unique_filename)
-            
-            # Save file
-            file.save(file_path)
 
-            # Server-side optimization: shrink image after upload so disk usage
-            # stays lean even if the client sends a large original.
+            # Refuse decompression bombs from the header alone, before anything is written or decoded
             try:
-                optimize_image_file_in_place(file_path, quality=85, max_dim=1600)
-            except Exception as e:
-                # Optimization failures should not break the upload flow
-                current_app.logger.error(f"Image optimization failed for {file_path}: {e}")
+                source_suffix = check_upload_size(file.stream)
+            except ImageTooLarge as e:
+                return make_response({"error": str(e)}, 413)
+            
+            # Save the file under a hash of its contents, so a retried or repeated upload
+            # reuses the stored copy. New files are optimized in the background so disk
+            # usage stays lean without holding this request open while it resizes.
+            unique_filename, job = store_upload(file.stream, file.mimetype, source_suffix)
 
             # Return the URL (in production, this would be a CDN URL)
             image_url = f"/uploads/{unique_filename}"
             
-            return make_response({"imageUrl": image_url}, 200)
+            response_body = {
+                "imageUrl": image_url,
+                "variants": get_upload_variants(image_url),
+                "status": job.status,
+                "statusUrl": f"/upload-image/{unique_filename}/status"
+            }
+            return make_response(add_upload_metadata(response_body, unique_filename), 202)
             
         except Exception as e:
             return make_response({"error": str(e)}, 500)
 
 api.add_resource(UploadImage, '/upload-image')
 
+# I report whether an upload has finished its background optimization
+class UploadImageStatus(Resource):
+    def get(self, filename):
+        job = get_image_job(filename)
+        if not job:
+            return make_response({"error": "Upload not found"}, 404)
+        image_url = f"/uploads/{job.filename}"
+        response_body = {
+            "imageUrl": image_url,
+            "variants": get_upload_variants(image_url),
+            "status": job.status
+        }
+        if job.error:
+            response_body["error"] = job.error
+        return make_response(add_upload_metadata(response_body, job.filename), 200)
+
+api.add_resource(UploadImageStatus, '/upload-image/<path:filename>/status')
+
 # CRUD for activities
 # I build the activity feed here, filtering to followed users when I know who's logged in
 class AllActivities(Resource):
     def get(self):
         # Get current user ID from request if available
         current_user_id = request.args.get('user_id', type=int)
-        
+
+        # Page size and position in the feed
+        limit = request.args.get('limit', FEED_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, FEED_MAX_LIMIT))
+
+        cursor = None
+        if request.args.get('cursor'):
+            try:
+                cursor = decode_feed_cursor(request.args.get('cursor'))
+            except ValueError as e:
+                return make_response({"error": str(e)}, 400)
+
+        # If no user is logged in, show all activities (or you could return empty)
+        following_ids = None
         if current_user_id:
             # Get the current user and their following relationships
             current_user = db.session.get(User, current_user_id)
@@ -526,22 +964,32 @@ class AllActivities(Resource):
             
             # Add current user's own ID to the list
             following_ids.append(current_user_id)
-            
-            # Filter activities to only include posts from followed users and current user
-            stmt = select(Activity).where(Activity.user_id.in_(following_ids))
-            result = db.session.execute(stmt)
-            activities = result.scalars().all()
+
+        # Fetch one extra row to find out whether another page exists
+        if following_ids is not None and timeline.timeline_enabled():
+            activities = get_timeline_activities(current_user_id, following_ids, cursor, limit + 1)
         else:
-            # If no user is logged in, show all activities (or you could return empty)
-            stmt = select(Activity)
-            result = db.session.execute(stmt)
-            activities = result.scalars().all()
-        
-        response_body = [get_activity_with_likes(activity, current_user_id) for activity in activities]
+            # Filter activities to only include posts from followed users and current user
+            activities = db.session.execute(select_activity_page(following_ids, cursor, limit + 1)).scalars().all()
+        has_more = len(activities) > limit
+        activities = activities[:limit]
+
+        response_body = {
+            'activities': get_activities_with_likes(activities, current_user_id),
+            'next_cursor': encode_feed_cursor(activities[-1]) if has_more else None
+        }
         
         return make_response(response_body, 200)
     
     def post(self):
+        # Embedded base64 photos are stored as uploads so the activity row only holds URLs
+        try:
+            photos = prepare_activity_photos(request.json.get('photos'))
+        except InvalidPhoto as e:
+            return make_response({"error": str(e)}, 400)
+        except ImageTooLarge as e:
+            return make_response({"error": str(e)}, 413)
+
         try:
             # Convert datetime string to datetime object if provided
             datetime_str = request.json.get('datetime')
@@ -556,10 +1004,16 @@ class AllActivities(Resource):
                 location_name=request.json.get('location_name'),
                 datetime=datetime_obj,
                 elapsed_time=request.json.get('elapsed_time'),
-                photos=request.json.get('photos'),
+                photos=photos,
                 user_id=request.json.get('user_id')
             )
             db.session.add(new_activity)
+            sync_activity_photos(new_activity)
+            adjust_upload_refs(None, new_activity.photos)
+            db.session.flush()
+
+            # Push the new activity into followers' home timelines in the same transaction
+            timeline.fan_out_activity(new_activity)
             db.session.commit()
             
             # Get current user ID for like status
@@ -590,10 +1044,13 @@ class ActivityById(Resource):
         activity = db.session.get(Activity, id)
         if activity:
             try:
-                data = request.json
+                data = dict(request.json)
+                if data.get('photos'):
+                    data['photos'] = prepare_activity_photos(data['photos'])
                 
                 # Only update allowed fields
                 allowed_fields = ['title', 'activity_type', 'description', 'song', 'location_name', 'photos']
+                old_photos = activity.photos
                 
                 for field in allowed_fields:
                     if field in data:
@@ -603,12 +1060,19 @@ class ActivityById(Resource):
                         else:
                             setattr(activity, field, data[field])
                 
+                if activity.photos != old_photos:
+                    sync_activity_photos(activity)
+                adjust_upload_refs(old_photos, activity.photos)
                 db.session.commit()
                 
                 # Get current user ID for like status
                 current_user_id = data.get('user_id')
                 response_body = get_activity_with_likes(activity, current_user_id)
                 return make_response(response_body, 200)
+            except InvalidPhoto as e:
+                return make_response({"error": str(e)}, 400)
+            except ImageTooLarge as e:
+                return make_response({"error": str(e)}, 413)
             except Exception as e:
                 db.session.rollback()
                 response_body = {
@@ -625,6 +1089,8 @@ class ActivityById(Resource):
         activity = db.session.get(Activity, id)
         if activity:
             try:
+                timeline.remove_activity(activity.id)
+                adjust_upload_refs(activity.photos, None)
                 db.session.delete(activity)
                 db.session.commit()
                 return make_response({}, 204)
@@ -680,6 +1146,7 @@ class AllComments(Resource):
                 user_id=request.json.get('user_id')
             )
             db.session.add(new_comment)
+            adjust_activity_counter(new_comment.activity_id, 'comment_count', 1)
             db.session.commit()
             
             # Return comment with user information
@@ -732,6 +1199,7 @@ class CommentById(Resource):
     def delete(self, id):
         comment = db.session.get(Comment, id)
         if comment:
+            adjust_activity_counter(comment.activity_id, 'comment_count', -1)
             db.session.delete(comment)
             db.session.commit()
             return make_response({}, 204)
@@ -772,6 +1240,7 @@ class LikeActivity(Resource):
             )
             
             db.session.add(new_like)
+            adjust_activity_counter(activity_id, 'like_count', 1)
             db.session.commit()
             
             # Get the updated activity with like information
@@ -807,6 +1276,7 @@ class UnlikeActivity(Resource):
                 return make_response({"error": "Like not found"}, 404)
             
             db.session.delete(like)
+            adjust_activity_counter(activity_id, 'like_count', -1)
             db.session.commit()
             
             # Get the updated activity with like information
@@ -837,15 +1307,11 @@ def handle_general_error(e):
     return make_response({"error": str(e)}, 500)
 
 if __name__ == '__main__':
-    # Run database migrations on startup
-    with app.app_context():
-        try:
-            from flask_migrate import upgrade
-            upgrade()
-            print("Database migrations completed successfully!")
-        except Exception as e:
-            print(f"Migration error: {e}")
+    # Unless a release phase already ran `flask release`
+    if app.config['MIGRATE_ON_STARTUP']:
+        run_migrations()
+        print("Database migrations completed successfully!")
     
-    port = int(os.environ.get('PORT', 5555))
+    port = env_int('PORT', 5555)
     app.run(host='0.0.0.0', port=port, debug=False)
 
@@ -0,0 +1,21 @@
+"""
+ASGI entry point for Still Strava.
+
+Serves the Flask app from an ASGI server, for example:
+
+    uvicorn asgi:application --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+
+The event loop owns the client connections: slow clients, keep-alives and
+streamed uploads cost no thread while they wait. The app itself is still
+WSGI, so each request runs on a pool of `ASGI_WSGI_THREADS` threads
+per process.
+"""
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+from config import env_int
+
+
+application = WSGIMiddleware(app, workers=env_int('ASGI_WSGI_THREADS', 16))
@@ -0,0 +1,217 @@
+"""
+In-memory username autocomplete for Still Strava.
+
+`/users/autocomplete` answers prefix lookups from a compact index held
+in each worker instead of querying the database on every keystroke.
+
+The index is a pair of parallel sorted lists (lowercased usernames and
+their `(id, username)` entries), so a prefix lookup is a binary search
+followed by a short slice. That costs far less memory than a
+node-per-character trie.
+
+- It is loaded on first use from a snapshot file younger than
+  `AUTOCOMPLETE_SNAPSHOT_MAX_AGE_SECONDS`, so workers start quickly, and
+  only built from the `users` table when there is none.
+- Signup, user creation, renames and deletes update it incrementally.
+  Each change is also journaled, and replayed on top of whatever the
+  index loads next, so a snapshot older than the change cannot undo it.
+- Changes made by other workers show up after about
+  `AUTOCOMPLETE_REFRESH_SECONDS`: a stale index keeps answering while a
+  background thread reloads it, from a newer snapshot if another worker
+  wrote one and from the database otherwise.
+- It holds at most `AUTOCOMPLETE_MAX_ENTRIES` usernames.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import select
+
+from config import app, db
+from models import User
+
+
+class UsernameIndex:
+    """Sorted-array prefix index over usernames"""
+
+    def __init__(self, max_entries, journal_seconds):
+        self.max_entries = max_entries
+        self.journal_seconds = journal_seconds
+        self._keys = []
+        self._entries = []
+        self._built_at = None
+        # (time, user_id, old_username, new_username) for each change, replayed after a load
+        self._journal = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def load(self, entries, built_at=None):
+        """Replace the index contents with `(id, username)` pairs read at `built_at`"""
+        if built_at is None:
+            built_at = time.time()
+        pairs = sorted(
+            ((username.lower(), (user_id, username)) for user_id, username in entries),
+            key=lambda pair: (pair[0], pair[1][0])
+        )
+        if len(pairs) > self.max_entries:
+            app.logger.warning(
+                f"Username index capped at {self.max_entries} of {len(pairs)} users"
+            )
+            pairs = pairs[:self.max_entries]
+        keys = [key for key, _ in pairs]
+        values = [value for _, value in pairs]
+        with self._lock:
+            self._keys, self._entries = keys, values
+            self._built_at = built_at
+            # Changes since the data was read are missing from it; changes before are already in it
+            self._journal = [change for change in self._journal if change[0] >= built_at]
+            for _, user_id, old_username, new_username in self._journal:
+                self._apply(user_id, old_username, new_username)
+
+    @property
+    def loaded(self):
+        return self._built_at is not None
+
+    def is_stale(self, max_age):
+        return self._built_at is None or time.time() - self._built_at > max_age
+
+    def add(self, user_id, username):
+        """Index a new username"""
+        self._change(user_id, None, username)
+
+    def remove(self, user_id, username):
+        """Drop a username from the index"""
+        self._change(user_id, username, None)
+
+    def rename(self, user_id, old_username, new_username):
+        """Move a user to their new username"""
+        if old_username != new_username:
+            self._change(user_id, old_username, new_username)
+
+    def _change(self, user_id, old_username, new_username):
+        """Apply a change now and journal it for the next load"""
+        now = time.time()
+        with self._lock:
+            cutoff = now - self.journal_seconds
+            while self._journal and self._journal[0][0] < cutoff:
+                self._journal.pop(0)
+            self._journal.append((now, user_id, old_username, new_username))
+            self._apply(user_id, old_username, new_username)
+
+    def _apply(self, user_id, old_username, new_username):
+        """Remove and/or insert one entry; safe to repeat, as replays do. Call with the lock held."""
+        if old_username is not None:
+            key = old_username.lower()
+            position = bisect.bisect_left(self._keys, key)
+            while position < len(self._keys) and self._keys[position] == key:
+                if self._entries[position][0] == user_id:
+                    del self._keys[position]
+                    del self._entries[position]
+                    break
+                position += 1
+        if new_username is not None:
+            key = new_username.lower()
+            position = bisect.bisect_left(self._keys, key)
+            end = bisect.bisect_right(self._keys, key)
+            if (user_id, new_username) in self._entries[position:end]:
+                return
+            if len(self._keys) >= self.max_entries:
+                return
+            self._keys.insert(end, key)
+            self._entries.insert(end, (user_id, new_username))
+
+    def complete(self, prefix, limit):
+        """Return up to `limit` `(id, username)` pairs whose username starts with `prefix`"""
+        key = prefix.lower()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, key)
+            matches = []
+            for position in range(start, min(start + limit, len(self._keys))):
+                if not self._keys[position].startswith(key):
+                    break
+                matches.append(self._entries[position])
+            return matches
+
+    def snapshot(self):
+        """Return the index as a JSON-serializable dict"""
+        with self._lock:
+            return {'built_at': self._built_at, 'entries': list(self._entries)}
+
+
+username_index = UsernameIndex(
+    app.config['AUTOCOMPLETE_MAX_ENTRIES'],
+    app.config['AUTOCOMPLETE_SNAPSHOT_MAX_AGE_SECONDS'],
+)
+_refresh_lock = threading.Lock()
+
+
+def _read_snapshot(path, max_age):
+    """Return a snapshot dict from `path` if it exists and is younger than `max_age` seconds"""
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    if time.time() - snapshot.get('built_at', 0) > max_age:
+        return None
+    return snapshot
+
+
+def _write_snapshot(path, snapshot):
+    """Write a snapshot atomically so concurrent workers never read a partial file"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w') as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except OSError as e:
+        app.logger.warning(f"Could not write username index snapshot {path}: {e}")
+
+
+def rebuild_username_index():
+    """Rebuild the index from the users table and refresh the snapshot file"""
+    # Stamped before the query, so changes committed while it runs are replayed on top
+    started = time.time()
+    rows = db.session.execute(select(User.id, User.username)).all()
+    username_index.load(rows, started)
+    snapshot_path = app.config['AUTOCOMPLETE_SNAPSHOT_PATH']
+    if snapshot_path:
+        _write_snapshot(snapshot_path, username_index.snapshot())
+
+
+def _reload_username_index(max_age):
+    """Load a snapshot younger than `max_age` seconds, or rebuild from the database"""
+    snapshot_path = app.config['AUTOCOMPLETE_SNAPSHOT_PATH']
+    snapshot = _read_snapshot(snapshot_path, max_age) if snapshot_path else None
+    if snapshot:
+        username_index.load(snapshot['entries'], snapshot['built_at'])
+    else:
+        rebuild_username_index()
+
+
+def _refresh_in_background():
+    """Thread target: reload a stale index outside any request"""
+    try:
+        with app.app_context():
+            _reload_username_index(app.config['AUTOCOMPLETE_REFRESH_SECONDS'])
+    except Exception as e:
+        app.logger.error(f"Username index refresh failed: {e}")
+    finally:
+        _refresh_lock.release()
+
+
+def get_username_index():
+    """Return the username index, loading it on first use and refreshing it in the background when stale"""
+    if not username_index.loaded:
+        # Nothing to answer from yet, so the first lookup waits for the load
+        with _refresh_lock:
+            if not username_index.loaded:
+                _reload_username_index(app.config['AUTOCOMPLETE_SNAPSHOT_MAX_AGE_SECONDS'])
+    elif username_index.is_stale(app.config['AUTOCOMPLETE_REFRESH_SECONDS']) and _refresh_lock.acquire(blocking=False):
+        threading.Thread(target=_refresh_in_background, name='username-index-refresh', daemon=True).start()
+    return username_index
@@ -0,0 +1,29 @@
+"""
+Thread pools that keep working under gevent.
+
+gunicorn's gevent workers monkey-patch `threading`, which turns the
+workers of a plain ThreadPoolExecutor into greenlets sharing one OS
+thread. CPU-bound work such as bcrypt or image resizing would then
+block every request in the worker. `make_thread_pool` hands out gevent's
+native-thread pool instead whenever threading has been patched.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+
+def gevent_patched():
+    """Whether gevent has monkey-patched threading in this process"""
+    # Only ask gevent if something already imported it
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('threading')
+
+
+def make_thread_pool(max_workers, thread_name_prefix=''):
+    """Return a ThreadPoolExecutor whose workers are real OS threads"""
+    if gevent_patched():
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
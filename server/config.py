@@ -4,20 +4,37 @@ import os
 # Remote library imports
 from flask import Flask
 from flask_cors import CORS
-from flask_migrate import Migrate
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
+from sqlalchemy.pool import NullPool
 from flask_jwt_extended import JWTManager
 
 # Local imports
 
+# Helper functions to read settings; a blank variable (`KEY=` copied from .env.example) means the default
+def env_str(name, default=None):
+    """Return the environment variable `name`, or `default` when it is unset or blank"""
+    return os.environ.get(name) or default
+
+def env_int(name, default):
+    """Return the environment variable `name` as an int, or `default` when it is unset or blank"""
+    return int(env_str(name, default))
+
+def env_bool(name, default):
+    """Return the environment variable `name` as a boolean (1/true/yes), or `default` when it is unset or blank"""
+    value = env_str(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes')
+
 # Instantiate app, set attributes
 app = Flask(__name__)
 
+# The flask CLI (`flask db`, `flask release`, maintenance commands) sets FLASK_RUN_FROM_CLI before loading the app
+running_cli = os.environ.get('FLASK_RUN_FROM_CLI') == 'true'
+
 # Set ALL config before initializing extensions
 # Use PostgreSQL in production, SQLite in development
-database_url = os.environ.get('DATABASE_URL')
+database_url = env_str('DATABASE_URL')
 if database_url:
     # Replace postgres:// with postgresql:// for SQLAlchemy compatibility
     if database_url.startswith('postgres://'):
@@ -27,39 +44,127 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'super-secret-key')
-app.config["JWT_SECRET_KEY"] = os.environ.get('JWT_SECRET_KEY', "your-secret-key")
+
+# Database connection pool, per worker process. Pre-ping replaces connections the
+# server or a load balancer dropped; recycle retires them before idle timeouts do.
+app.config['DB_POOL_SIZE'] = env_int('DB_POOL_SIZE', 5)
+app.config['DB_MAX_OVERFLOW'] = env_int('DB_MAX_OVERFLOW', 5)
+app.config['DB_POOL_TIMEOUT'] = env_int('DB_POOL_TIMEOUT', 10)
+app.config['DB_POOL_RECYCLE'] = env_int('DB_POOL_RECYCLE', 1800)
+app.config['DB_POOL_PRE_PING'] = env_bool('DB_POOL_PRE_PING', True)
+app.config['DB_CONNECT_TIMEOUT'] = env_int('DB_CONNECT_TIMEOUT', 5)
+# Postgres only: cancel statements running longer than this (0 turns it off). Web requests only:
+# migrations and maintenance commands build indexes and backfill whole tables.
+app.config['DB_STATEMENT_TIMEOUT_MS'] = 0 if running_cli else env_int('DB_STATEMENT_TIMEOUT_MS', 15000)
+# Behind PgBouncer in transaction mode: no pool of our own, and settings applied per transaction
+app.config['DB_PGBOUNCER'] = env_bool('DB_PGBOUNCER', False)
+
+engine_options = {'pool_pre_ping': app.config['DB_POOL_PRE_PING']}
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+    engine_options['connect_args'] = {'connect_timeout': app.config['DB_CONNECT_TIMEOUT']}
+    if app.config['DB_PGBOUNCER']:
+        # PgBouncer already pools; a second pool here would pin its server connections
+        engine_options['poolclass'] = NullPool
+    else:
+        engine_options.update(
+            pool_size=app.config['DB_POOL_SIZE'],
+            max_overflow=app.config['DB_MAX_OVERFLOW'],
+            pool_timeout=app.config['DB_POOL_TIMEOUT'],
+            pool_recycle=app.config['DB_POOL_RECYCLE'],
+            # Reuse the most recent connection so spare ones sit idle and get recycled
+            pool_use_lifo=True,
+        )
+        if app.config['DB_STATEMENT_TIMEOUT_MS']:
+            engine_options['connect_args']['options'] = f"-c statement_timeout={app.config['DB_STATEMENT_TIMEOUT_MS']}"
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+app.config['SECRET_KEY'] = env_str('SECRET_KEY', 'super-secret-key')
+app.config["JWT_SECRET_KEY"] = env_str('JWT_SECRET_KEY', "your-secret-key")
 app.config["JWT_TOKEN_LOCATION"] = ["headers"]
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = False  # Tokens never expire (for development)
 app.json.compact = False
 
+# Materialized home timelines (fan-out on write), off by default
+app.config['TIMELINE_ENABLED'] = env_bool('TIMELINE_ENABLED', False)
+# Most entries kept per user timeline; older activities are read from the activities table
+app.config['TIMELINE_MAX_ENTRIES'] = env_int('TIMELINE_MAX_ENTRIES', 800)
+# Authors with more followers than this are not fanned out and are merged in at read time instead
+app.config['TIMELINE_FANOUT_MAX_FOLLOWERS'] = env_int('TIMELINE_FANOUT_MAX_FOLLOWERS', 5000)
+# User search backend: auto, trigram (Postgres pg_trgm), fts5 (SQLite) or like
+app.config['USER_SEARCH_BACKEND'] = env_str('USER_SEARCH_BACKEND', 'auto')
+# In-memory username autocomplete: size cap, background refresh interval, and the snapshot file
+# workers start from (ignored once older than AUTOCOMPLETE_SNAPSHOT_MAX_AGE_SECONDS)
+app.config['AUTOCOMPLETE_MAX_ENTRIES'] = env_int('AUTOCOMPLETE_MAX_ENTRIES', 1000000)
+app.config['AUTOCOMPLETE_REFRESH_SECONDS'] = env_int('AUTOCOMPLETE_REFRESH_SECONDS', 300)
+app.config['AUTOCOMPLETE_SNAPSHOT_PATH'] = env_str('AUTOCOMPLETE_SNAPSHOT_PATH', 'username_index.json')
+app.config['AUTOCOMPLETE_SNAPSHOT_MAX_AGE_SECONDS'] = env_int('AUTOCOMPLETE_SNAPSHOT_MAX_AGE_SECONDS', 86400)
+# Where uploads are stored, and how they are optimized after upload: process, thread or sync
+app.config['UPLOAD_FOLDER'] = env_str('UPLOAD_FOLDER', 'uploads')
+app.config['IMAGE_OPTIMIZE_MODE'] = env_str('IMAGE_OPTIMIZE_MODE', 'process')
+app.config['IMAGE_OPTIMIZE_WORKERS'] = env_int('IMAGE_OPTIMIZE_WORKERS', 2)
+# Smaller copies written next to each upload, as name:max_dim pairs
+app.config['IMAGE_VARIANTS'] = env_str('IMAGE_VARIANTS', 'thumb:320,medium:800')
+# Uploads are stored in IMAGE_OUTPUT_FORMAT; IMAGE_ALTERNATE_FORMATS are served to browsers that accept them
+app.config['IMAGE_OUTPUT_FORMAT'] = env_str('IMAGE_OUTPUT_FORMAT', 'jpeg')
+app.config['IMAGE_ALTERNATE_FORMATS'] = env_str('IMAGE_ALTERNATE_FORMATS', 'avif,webp')
+# Uploads over IMAGE_MAX_PIXELS are refused; each optimization worker decodes at most IMAGE_MEMORY_BUDGET_MB at a time
+app.config['IMAGE_MAX_PIXELS'] = env_int('IMAGE_MAX_PIXELS', 100_000_000)
+app.config['IMAGE_MEMORY_BUDGET_MB'] = env_int('IMAGE_MEMORY_BUDGET_MB', 256)
+# Unreferenced uploads younger than this are kept by `flask gc-uploads`, so photos picked before an activity is saved survive
+app.config['UPLOAD_GC_GRACE_HOURS'] = env_int('UPLOAD_GC_GRACE_HOURS', 24)
+# How /uploads hands over file bytes: flask (stream from the worker), x-sendfile (Apache/lighttpd)
+# or x-accel (nginx internal location UPLOAD_ACCEL_PREFIX, aliased to UPLOAD_FOLDER)
+app.config['UPLOAD_SENDFILE_MODE'] = env_str('UPLOAD_SENDFILE_MODE', 'flask')
+app.config['UPLOAD_ACCEL_PREFIX'] = env_str('UPLOAD_ACCEL_PREFIX', '/_uploads/')
+app.config['USE_X_SENDFILE'] = app.config['UPLOAD_SENDFILE_MODE'] == 'x-sendfile'
+# Where uploads live: local (UPLOAD_FOLDER) or s3 (any S3-compatible bucket; set S3_ENDPOINT_URL for MinIO)
+app.config['UPLOAD_STORAGE'] = env_str('UPLOAD_STORAGE', 'local')
+app.config['S3_BUCKET'] = env_str('S3_BUCKET')
+app.config['S3_PREFIX'] = env_str('S3_PREFIX', 'uploads/')
+app.config['S3_ENDPOINT_URL'] = env_str('S3_ENDPOINT_URL')
+app.config['S3_REGION'] = env_str('S3_REGION')
+app.config['S3_ACCESS_KEY_ID'] = env_str('S3_ACCESS_KEY_ID')
+app.config['S3_SECRET_ACCESS_KEY'] = env_str('S3_SECRET_ACCESS_KEY')
+app.config['S3_MAX_POOL_CONNECTIONS'] = env_int('S3_MAX_POOL_CONNECTIONS', 10)
+app.config['S3_MULTIPART_CHUNK_MB'] = env_int('S3_MULTIPART_CHUNK_MB', 8)
+# Base64 data URLs in activity photos: convert (store them as uploads) or reject
+app.config['ACTIVITY_PHOTO_DATA_URLS'] = env_str('ACTIVITY_PHOTO_DATA_URLS', 'convert')
+# bcrypt cost for new password hashes; hashes with another cost are rehashed at the next login
+app.config['BCRYPT_ROUNDS'] = env_int('BCRYPT_ROUNDS', 12)
+# Password hashes run on this many threads; past that many more waiting, requests get a 429
+app.config['PASSWORD_HASH_WORKERS'] = env_int('PASSWORD_HASH_WORKERS', 2)
+app.config['PASSWORD_HASH_MAX_PENDING'] = env_int('PASSWORD_HASH_MAX_PENDING', 8)
+# Migrate once when the server starts (see release.py); set to false where a release phase or
+# pre-deploy command already runs `flask release`
+app.config['MIGRATE_ON_STARTUP'] = env_bool('MIGRATE_ON_STARTUP', True)
+
 # Define metadata, instantiate db
 metadata = MetaData(naming_convention={
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
 db = SQLAlchemy(metadata=metadata)
-migrate = Migrate(app, db)
 db.init_app(app)
 
+# Helper function to register Flask-Migrate only where migrations can run
+def init_migrate():
+    """Register Flask-Migrate on the app; it imports Alembic, so web workers never call this"""
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+if running_cli:
+    init_migrate()
+
 # Instantiate REST API
 api = Api(app)
 
 # Instantiate CORS
 # Allow both localhost for development and your deployed frontend URL
 allowed_origins = ["http://localhost:3000"]
-if os.environ.get('FRONTEND_URL'):
-    allowed_origins.append(os.environ.get('FRONTEND_URL'))
+if env_str('FRONTEND_URL'):
+    allowed_origins.append(env_str('FRONTEND_URL'))
 CORS(app, supports_credentials=True, origins=allowed_origins)
 
 # Instantiate JWT Manager
 jwt = JWTManager(app)
 
-# Run database migrations on app startup
-with app.app_context():
-    try:
-        from flask_migrate import upgrade
-        upgrade()
-        print("Database migrations completed successfully!")
-    except Exception as e:
-        print(f"Migration error: {e}")
 
@@ -0,0 +1,76 @@
+"""
+Database connection pool monitoring for Still Strava.
+
+The pool itself is configured in config.py from the `DB_*` settings. This
+module counts what the pool does in this worker process (connections
+opened, checkouts, connections invalidated after errors) and reports it,
+with the pool's current occupancy, at `/health/db`.
+
+Behind PgBouncer (`DB_PGBOUNCER`) the app keeps no pool of its own, and
+the statement timeout is set at the start of each transaction: PgBouncer
+hands server connections from client to client, so settings made when a
+connection opens would leak to other clients or be refused outright.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event, text
+
+from config import app, db
+
+
+_counters = {
+    'connects': 0,
+    'checkouts': 0,
+    'invalidations': 0,
+}
+_counters_lock = threading.Lock()
+_started_at = time.time()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def _install_listeners(engine):
+    event.listen(engine, 'connect', lambda dbapi_connection, record: _count('connects'))
+    event.listen(engine, 'checkout', lambda dbapi_connection, record, proxy: _count('checkouts'))
+    event.listen(engine, 'invalidate', lambda dbapi_connection, record, exception: _count('invalidations'))
+
+    timeout_ms = app.config['DB_STATEMENT_TIMEOUT_MS']
+    if app.config['DB_PGBOUNCER'] and timeout_ms and engine.dialect.name == 'postgresql':
+        @event.listens_for(engine, 'begin')
+        def set_statement_timeout(connection):
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+with app.app_context():
+    _install_listeners(db.engine)
+
+
+def pool_status():
+    """Return this process's pool occupancy and counters"""
+    pool = db.engine.pool
+    status = {'pool': type(pool).__name__, 'uptime_seconds': round(time.time() - _started_at)}
+    # NullPool and SQLite's single-connection pools have no size to report
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    with _counters_lock:
+        status.update(_counters)
+    return status
+
+
+def check_database():
+    """Run a trivial query; return (ok, elapsed milliseconds)"""
+    start = time.perf_counter()
+    try:
+        db.session.execute(text('SELECT 1'))
+        ok = True
+    except Exception as e:
+        app.logger.error(f"Database health check failed: {e}")
+        db.session.rollback()
+        ok = False
+    return ok, round((time.perf_counter() - start) * 1000, 1)
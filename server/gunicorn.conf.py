@@ -0,0 +1,98 @@
+"""
+gunicorn settings for Still Strava.
+
+gunicorn loads this file automatically when started from server/, so the
+Procfile's `gunicorn app:app` picks it up. `GUNICORN_PROFILE` selects how
+each worker handles concurrent requests:
+
+- `gthread` (default): a few processes with a pool of threads each. A
+  request waiting on the database, S3 or bcrypt (which releases the GIL)
+  no longer holds up the whole worker.
+- `gevent`: one process per CPU with many greenlets, for lots of
+  slow, I/O-bound requests. Needs `gevent` and `psycogreen`; psycopg2 is
+  made cooperative after each fork so database calls yield too.
+- `sync`: gunicorn's default one-request-per-process workers.
+
+`GUNICORN_WORKERS`, `GUNICORN_THREADS` and `GUNICORN_WORKER_CONNECTIONS`
+override the profile's sizes. Every worker process has its own database
+connection pool, so more workers means more connections.
+
+For an ASGI server instead, see asgi.py.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+
+def env_int(name, default):
+    """Return the environment variable `name` as an int, or `default` when it is unset or blank"""
+    return int(os.environ.get(name) or default)
+
+
+def env_bool(name, default):
+    """Return the environment variable `name` as a boolean (1/true/yes), or `default` when it is unset or blank"""
+    value = os.environ.get(name)
+    return default if not value else value.lower() in ('1', 'true', 'yes')
+
+
+profile = os.environ.get('GUNICORN_PROFILE') or 'gthread'
+cpus = multiprocessing.cpu_count()
+
+if profile == 'gthread':
+    worker_class = 'gthread'
+    workers = env_int('GUNICORN_WORKERS', cpus + 1)
+    threads = env_int('GUNICORN_THREADS', 8)
+elif profile == 'gevent':
+    worker_class = 'gevent'
+    workers = env_int('GUNICORN_WORKERS', cpus)
+    worker_connections = env_int('GUNICORN_WORKER_CONNECTIONS', 200)
+    # A process pool's helper threads would be greenlets here; resize on native threads instead
+    if not os.environ.get('IMAGE_OPTIMIZE_MODE'):
+        os.environ['IMAGE_OPTIMIZE_MODE'] = 'thread'
+elif profile == 'sync':
+    worker_class = 'sync'
+    workers = env_int('GUNICORN_WORKERS', cpus * 2 + 1)
+else:
+    raise RuntimeError(f"Unknown GUNICORN_PROFILE {profile!r}; expected gthread, gevent or sync")
+
+# Slow uploads and S3 transfers need longer than gunicorn's 30 s default
+timeout = env_int('GUNICORN_TIMEOUT', 60)
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = max_requests // 10
+# Import the app once in the master so workers fork already loaded. Not with
+# gevent: it has to patch the standard library before the app is imported.
+preload_app = (
+    env_bool('GUNICORN_PRELOAD', False)
+    and profile != 'gevent'
+)
+
+
+def on_starting(server):
+    # Workers never migrate; unless a release phase already did, the master does it once
+    if env_bool('MIGRATE_ON_STARTUP', True):
+        # In a subprocess, so the master stays free of the app (gevent must patch before it loads)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'release'], check=True)
+
+
+def post_fork(server, worker):
+    if profile == 'gevent':
+        # Make psycopg2 wait on gevent instead of blocking the whole worker
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    if preload_app:
+        # Connections opened in the master must not be shared between workers
+        from config import app, db
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # max_requests recycling would otherwise drop the image jobs still in this worker's pool
+    from image_jobs import shutdown_image_jobs
+    shutdown_image_jobs()
@@ -0,0 +1,240 @@
+"""
+Background image optimization for Still Strava uploads.
+
+`/upload-image` stores the original file, records an `ImageJob` row and
+returns straight away. The LANCZOS resize and re-encode then run on a
+pool outside the request. The upload URL names the optimized file and
+never changes. Until optimization succeeds the original is kept under
+the extension of its actual format (`ImageJob.source_filename`), so it
+is served with the right content type; the optimized file then replaces
+it, and the smaller `IMAGE_VARIANTS` and any `IMAGE_ALTERNATE_FORMATS`
+(WebP/AVIF) encodings are written next to it.
+`/upload-image/<filename>/status` reports progress from the
+`image_jobs` table, so any web worker can answer it.
+
+`IMAGE_OPTIMIZE_MODE` selects the pool:
+
+- `process` (default): a process pool, so resizing never competes with
+  request threads for the GIL.
+- `thread`: a thread pool, for environments that cannot fork, and for
+  gevent workers (see gunicorn.conf.py).
+- `sync`: optimize inside the request, as before.
+
+When gunicorn recycles a worker, `shutdown_image_jobs` lets the jobs
+already running finish and marks the ones still queued as failed. If a
+worker dies before finishing, its jobs stay `pending` and
+`flask process-image-jobs` re-runs them.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache, partial
+import multiprocessing
+import os
+import threading
+
+from sqlalchemy import update
+
+from config import app, db
+from concurrency import make_thread_pool
+from models import ActivityPhoto, ImageJob, UploadBlob
+from storage import get_upload_storage
+from utils.image_utils import (
+    OUTPUT_FORMATS,
+    OptimizeOptions,
+    check_image_file,
+    format_supported,
+    optimize_image_file_in_place,
+    parse_formats,
+    parse_variants,
+)
+
+
+IMAGE_VARIANTS = parse_variants(app.config['IMAGE_VARIANTS'])
+IMAGE_MAX_PIXELS = app.config['IMAGE_MAX_PIXELS']
+IMAGE_MEMORY_BUDGET = app.config['IMAGE_MEMORY_BUDGET_MB'] * 1024 * 1024
+IMAGE_OUTPUT_FORMAT = app.config['IMAGE_OUTPUT_FORMAT']
+if IMAGE_OUTPUT_FORMAT not in OUTPUT_FORMATS:
+    raise RuntimeError(f"Unknown IMAGE_OUTPUT_FORMAT {IMAGE_OUTPUT_FORMAT!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+# In order of preference
+CONFIGURED_ALTERNATE_FORMATS = [
+    fmt for fmt in parse_formats(app.config['IMAGE_ALTERNATE_FORMATS'])
+    if fmt != IMAGE_OUTPUT_FORMAT
+]
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_alternate_formats():
+    """
+    The configured alternate formats this Pillow build can write, after
+    checking it can write IMAGE_OUTPUT_FORMAT at all. Checked on first use
+    rather than at import, since it loads every Pillow plugin.
+    """
+    if not format_supported(IMAGE_OUTPUT_FORMAT):
+        raise RuntimeError(f"IMAGE_OUTPUT_FORMAT {IMAGE_OUTPUT_FORMAT!r} is not supported by this Pillow build")
+
+    formats = []
+    for fmt in CONFIGURED_ALTERNATE_FORMATS:
+        if format_supported(fmt):
+            formats.append(fmt)
+        else:
+            app.logger.info(f"Pillow cannot write {fmt}; uploads will not get a {fmt} copy")
+    return tuple(formats)
+
+
+def _get_executor():
+    """Create the optimization pool on first use so idle workers never spawn one"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = app.config['IMAGE_OPTIMIZE_WORKERS']
+                if app.config['IMAGE_OPTIMIZE_MODE'] == 'thread':
+                    _executor = make_thread_pool(max_workers, thread_name_prefix='image-opt')
+                else:
+                    # Forking a threaded web worker can copy locks other threads hold
+                    # (logging, the connection pool) into the child; start it clean instead
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    _executor = ProcessPoolExecutor(
+                        max_workers=max_workers,
+                        mp_context=multiprocessing.get_context(method),
+                    )
+    return _executor
+
+
+def shutdown_image_jobs():
+    """Finish the running jobs and fail the queued ones before this worker exits"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _optimize(filename, source_filename=None):
+    """
+    Optimize a stored upload and return its `ImageInfo` (None if it was left
+    as it was); runs in the pool, so it fetches this process's storage itself.
+    An original kept as `source_filename` is re-encoded into `filename` and removed.
+    """
+    storage = get_upload_storage()
+    source = source_filename or filename
+    with storage.workspace(source) as file_path:
+        dst_path = os.path.join(os.path.dirname(file_path), filename)
+        info = optimize_image_file_in_place(
+            file_path,
+            dst=dst_path,
+            max_dim=1600,
+            variants=IMAGE_VARIANTS,
+            output_format=IMAGE_OUTPUT_FORMAT,
+            alternate_formats=list(get_alternate_formats()),
+            max_pixels=IMAGE_MAX_PIXELS,
+            memory_budget=IMAGE_MEMORY_BUDGET,
+        )
+        if not os.path.exists(dst_path):
+            raise RuntimeError(f"{source} could not be converted to {IMAGE_OUTPUT_FORMAT}")
+    if source != filename:
+        # Remote storage still holds the original after the workspace uploads the new files
+        storage.delete(source)
+    return info
+
+
+def check_upload_size(stream):
+    """
+    Raise ImageTooLarge for an upload whose header shows it is over the pixel or
+    memory limits; otherwise return the extension of its actual format, if known
+    """
+    return check_image_file(stream, OptimizeOptions(
+        max_dim=1600,
+        max_pixels=IMAGE_MAX_PIXELS,
+        memory_budget=IMAGE_MEMORY_BUDGET,
+    ))
+
+
+def _record_result(filename, error=None, info=None):
+    """Mark a job as done or failed, and store the optimized image's metadata"""
+    if info is not None:
+        metadata = {
+            'width': info.width,
+            'height': info.height,
+            'bytes': info.bytes,
+            'variants': info.variants,
+            'placeholder': info.placeholder,
+            'dominant_color': info.dominant_color,
+        }
+        db.session.execute(update(UploadBlob).where(UploadBlob.filename == filename).values(**metadata))
+        # Photos saved before optimization finished pick the metadata up now
+        db.session.execute(update(ActivityPhoto).where(ActivityPhoto.upload_filename == filename).values(**metadata))
+    job = ImageJob.query.filter_by(filename=filename).first()
+    if job:
+        job.status = 'failed' if error else 'done'
+        job.error = error
+        if not error:
+            # _optimize removed the original once `filename` was written
+            job.source_filename = None
+    db.session.commit()
+
+
+def _on_job_finished(filename, future):
+    """Pool callback: runs outside any request, so it opens its own app context"""
+    error = info = None
+    if future.cancelled():
+        error = "Worker shut down before optimizing this image"
+        app.logger.warning(f"Image optimization cancelled for {filename}: worker shutting down")
+    elif future.exception() is not None:
+        error = str(future.exception())
+        app.logger.error(f"Image optimization failed for {filename}: {error}")
+    else:
+        info = future.result()
+    with app.app_context():
+        _record_result(filename, error, info)
+
+
+def submit_image_optimization(filename, source_filename=None):
+    """Queue an uploaded file, stored as `source_filename` if that differs, for optimization and return its job"""
+    job = get_image_job(filename)
+    if job is None:
+        job = ImageJob(filename=filename)
+        db.session.add(job)
+    job.status = 'pending'
+    job.error = None
+    job.source_filename = source_filename
+    db.session.commit()
+
+    if app.config['IMAGE_OPTIMIZE_MODE'] == 'sync':
+        try:
+            _record_result(filename, info=_optimize(filename, source_filename))
+        except Exception as e:
+            # Optimization failures should not break the upload flow
+            app.logger.error(f"Image optimization failed for {filename}: {e}")
+            _record_result(filename, str(e))
+        return job
+
+    future = _get_executor().submit(_optimize, filename, source_filename)
+    future.add_done_callback(partial(_on_job_finished, filename))
+    return job
+
+
+def upload_suffix():
+    """File extension of optimized uploads, matching the format they are re-encoded into"""
+    return OUTPUT_FORMATS[IMAGE_OUTPUT_FORMAT].suffix
+
+
+def get_image_job(filename):
+    """Return the optimization job for an uploaded file, if there is one"""
+    return ImageJob.query.filter_by(filename=filename).first()
+
+
+@app.cli.command('process-image-jobs')
+def process_image_jobs_command():
+    """Re-run image optimization jobs left pending by a worker that went away."""
+    cutoff = datetime.utcnow() - timedelta(minutes=5)
+    jobs = ImageJob.query.filter(ImageJob.status == 'pending', ImageJob.created_at < cutoff).all()
+    for job in jobs:
+        try:
+            _record_result(job.filename, info=_optimize(job.filename, job.source_filename))
+        except Exception as e:
+            _record_result(job.filename, str(e))
+    print(f"Processed {len(jobs)} pending image jobs.")
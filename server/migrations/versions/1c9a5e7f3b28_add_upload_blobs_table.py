@@ -0,0 +1,31 @@
+"""add upload blobs table
+
+Revision ID: 1c9a5e7f3b28
+Revises: 0b7e4d1a9c35
+Create Date: 2026-10-17 14:22:10.584213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c9a5e7f3b28'
+down_revision = '0b7e4d1a9c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upload_blobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('filename')
+    )
+
+
+def downgrade():
+    op.drop_table('upload_blobs')
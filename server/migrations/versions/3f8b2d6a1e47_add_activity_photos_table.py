@@ -0,0 +1,112 @@
+"""add activity photos table
+
+Revision ID: 3f8b2d6a1e47
+Revises: 1c9a5e7f3b28
+Create Date: 2026-10-17 15:41:37.208164
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8b2d6a1e47'
+down_revision = '1c9a5e7f3b28'
+branch_labels = None
+depends_on = None
+
+UPLOAD_URL_PATTERN = re.compile(r'/uploads/([0-9a-f]{64}\.[a-z0-9]+)')
+BACKFILL_BATCH_SIZE = 500
+
+
+def split_photos(photos):
+    # Same splitting as uploads.split_photos, copied so the migration does not depend on app code
+    if '|||' in photos:
+        parts = photos.split('|||')
+    elif photos.startswith('data:'):
+        parts = [photos]
+    else:
+        parts = photos.split(',')
+    return [part.strip() for part in parts if part.strip()]
+
+
+def upgrade():
+    op.create_table('activity_photos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('activity_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('upload_filename', sa.String(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('bytes', sa.Integer(), nullable=True),
+    sa.Column('variants', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['activity_id'], ['activities.id'], name=op.f('fk_activity_photos_activity_id_activities')),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('activity_photos', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_photos_activity_id_position', ['activity_id', 'position'], unique=False)
+        batch_op.create_index('ix_activity_photos_upload_filename', ['upload_filename'], unique=False)
+
+    with op.batch_alter_table('upload_blobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('bytes', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('variants', sa.JSON(), nullable=True))
+
+    # Backfill one row per photo from the existing photos strings, a batch of
+    # activities at a time. Embedded data URLs are skipped: `flask
+    # externalize-photos` stores them as uploads and adds their rows. The
+    # dimensions and sizes come from the stored files, which migrations do not
+    # read: `flask backfill-photo-metadata` fills them in afterwards.
+    bind = op.get_bind()
+    activity_photos = sa.table('activity_photos',
+        sa.column('activity_id', sa.Integer()),
+        sa.column('position', sa.Integer()),
+        sa.column('url', sa.String()),
+        sa.column('upload_filename', sa.String()),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, photos FROM activities "
+                "WHERE id > :last_id AND photos IS NOT NULL AND photos != '' "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        photo_rows = []
+        for activity_id, photos in rows:
+            last_id = activity_id
+            urls = split_photos(photos)
+            if any(url.startswith('data:') for url in urls):
+                continue
+            for position, url in enumerate(urls):
+                match = UPLOAD_URL_PATTERN.search(url)
+                photo_rows.append({
+                    'activity_id': activity_id,
+                    'position': position,
+                    'url': url,
+                    'upload_filename': match.group(1) if match else None,
+                })
+        if photo_rows:
+            op.bulk_insert(activity_photos, photo_rows)
+
+
+def downgrade():
+    with op.batch_alter_table('upload_blobs', schema=None) as batch_op:
+        batch_op.drop_column('variants')
+        batch_op.drop_column('bytes')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
+
+    with op.batch_alter_table('activity_photos', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_photos_upload_filename')
+        batch_op.drop_index('ix_activity_photos_activity_id_position')
+
+    op.drop_table('activity_photos')
@@ -0,0 +1,36 @@
+"""add photo placeholders
+
+Revision ID: 4a6c8e1f2b93
+Revises: 3f8b2d6a1e47
+Create Date: 2026-10-17 16:20:48.917342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a6c8e1f2b93'
+down_revision = '3f8b2d6a1e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('upload_blobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('placeholder', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('dominant_color', sa.String(), nullable=True))
+
+    with op.batch_alter_table('activity_photos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('placeholder', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('dominant_color', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('activity_photos', schema=None) as batch_op:
+        batch_op.drop_column('dominant_color')
+        batch_op.drop_column('placeholder')
+
+    with op.batch_alter_table('upload_blobs', schema=None) as batch_op:
+        batch_op.drop_column('dominant_color')
+        batch_op.drop_column('placeholder')
@@ -0,0 +1,32 @@
+"""add follower count to users
+
+Revision ID: 5c1e7a9d3f42
+Revises: 4a6c8e1f2b93
+Create Date: 2026-10-17 18:05:12.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7a9d3f42'
+down_revision = '4a6c8e1f2b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the counter from the existing follows
+    op.execute(
+        "UPDATE users SET "
+        "follower_count = (SELECT COUNT(*) FROM follows WHERE follows.followed_id = users.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('follower_count')
@@ -0,0 +1,26 @@
+"""add timeline entries author_id index
+
+Revision ID: 6d2f8b0e4a53
+Revises: 5c1e7a9d3f42
+Create Date: 2026-10-17 18:31:40.218773
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2f8b0e4a53'
+down_revision = '5c1e7a9d3f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('timeline_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_timeline_entries_author_id', ['author_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('timeline_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_timeline_entries_author_id')
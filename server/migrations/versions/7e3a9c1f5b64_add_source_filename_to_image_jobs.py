@@ -0,0 +1,26 @@
+"""add source filename to image jobs
+
+Revision ID: 7e3a9c1f5b64
+Revises: 6d2f8b0e4a53
+Create Date: 2026-10-17 19:12:05.634218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3a9c1f5b64'
+down_revision = '6d2f8b0e4a53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('source_filename', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('image_jobs', schema=None) as batch_op:
+        batch_op.drop_column('source_filename')
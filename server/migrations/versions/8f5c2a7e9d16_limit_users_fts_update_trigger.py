@@ -0,0 +1,44 @@
+"""limit users fts update trigger
+
+Revision ID: 8f5c2a7e9d16
+Revises: 7e3a9c1f5b64
+Create Date: 2026-10-17 19:40:22.871093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f5c2a7e9d16'
+down_revision = '7e3a9c1f5b64'
+branch_labels = None
+depends_on = None
+
+TRIGGER_BODY = (
+    "BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, username, location, bio) "
+    "VALUES ('delete', old.id, old.username, old.location, old.bio); "
+    "INSERT INTO users_fts(rowid, username, location, bio) "
+    "VALUES (new.id, new.username, new.location, new.bio); END"
+)
+
+
+def _has_users_fts(bind):
+    return bind.dialect.name == 'sqlite' and sa.inspect(bind).has_table('users_fts')
+
+
+def upgrade():
+    # Databases created before f2d97a4c8e61 fired on every users update
+    # (follower_count, reset_token); only the indexed columns matter
+    bind = op.get_bind()
+    if _has_users_fts(bind):
+        op.execute('DROP TRIGGER IF EXISTS users_fts_au')
+        op.execute(f"CREATE TRIGGER users_fts_au AFTER UPDATE OF username, location, bio ON users {TRIGGER_BODY}")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if _has_users_fts(bind):
+        op.execute('DROP TRIGGER IF EXISTS users_fts_au')
+        op.execute(f"CREATE TRIGGER users_fts_au AFTER UPDATE ON users {TRIGGER_BODY}")
@@ -0,0 +1,26 @@
+"""add feed pagination index to activities
+
+Revision ID: a7c3e91d5b20
+Revises: 2ea1664926f3
+Create Date: 2026-10-17 09:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e91d5b20'
+down_revision = '2ea1664926f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.create_index('ix_activities_user_id_datetime_id', ['user_id', 'datetime', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_index('ix_activities_user_id_datetime_id')
@@ -0,0 +1,42 @@
+"""add timeline entries table
+
+Revision ID: c41f8d2e6a93
+Revises: a7c3e91d5b20
+Create Date: 2026-10-17 10:02:15.774910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f8d2e6a93'
+down_revision = 'a7c3e91d5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('timeline_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('activity_id', sa.Integer(), nullable=False),
+    sa.Column('activity_datetime', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['activity_id'], ['activities.id'], name=op.f('fk_timeline_entries_activity_id_activities')),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], name=op.f('fk_timeline_entries_author_id_users')),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_timeline_entries_user_id_users')),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'activity_id', name='unique_timeline_entry')
+    )
+    with op.batch_alter_table('timeline_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_timeline_entries_user_id_activity_datetime', ['user_id', 'activity_datetime', 'activity_id'], unique=False)
+        batch_op.create_index('ix_timeline_entries_activity_id', ['activity_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('timeline_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_timeline_entries_activity_id')
+        batch_op.drop_index('ix_timeline_entries_user_id_activity_datetime')
+
+    op.drop_table('timeline_entries')
@@ -0,0 +1,35 @@
+"""add like and comment counts to activities
+
+Revision ID: d58b2c7f0e14
+Revises: c41f8d2e6a93
+Create Date: 2026-10-17 10:48:03.519226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd58b2c7f0e14'
+down_revision = 'c41f8d2e6a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the counters from the existing likes and comments
+    op.execute(
+        "UPDATE activities SET "
+        "like_count = (SELECT COUNT(*) FROM likes WHERE likes.activity_id = activities.id), "
+        "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.activity_id = activities.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('like_count')
@@ -0,0 +1,58 @@
+"""add indexes on hot lookup columns
+
+Revision ID: e6a0f3b9c127
+Revises: d58b2c7f0e14
+Create Date: 2026-10-17 11:31:47.066153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a0f3b9c127'
+down_revision = 'd58b2c7f0e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate likes (keeping the earliest) so the unique constraint can be created
+    op.execute(
+        "DELETE FROM likes WHERE id NOT IN "
+        "(SELECT MIN(id) FROM likes GROUP BY user_id, activity_id)"
+    )
+    op.execute(
+        "UPDATE activities SET "
+        "like_count = (SELECT COUNT(*) FROM likes WHERE likes.activity_id = activities.id)"
+    )
+
+    with op.batch_alter_table('likes', schema=None) as batch_op:
+        batch_op.create_unique_constraint('unique_like', ['user_id', 'activity_id'])
+        batch_op.create_index('ix_likes_activity_id', ['activity_id'], unique=False)
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.create_index('ix_comments_activity_id', ['activity_id'], unique=False)
+        batch_op.create_index('ix_comments_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('follows', schema=None) as batch_op:
+        batch_op.create_index('ix_follows_followed_id', ['followed_id'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_reset_token', ['reset_token'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_reset_token')
+
+    with op.batch_alter_table('follows', schema=None) as batch_op:
+        batch_op.drop_index('ix_follows_followed_id')
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index('ix_comments_user_id')
+        batch_op.drop_index('ix_comments_activity_id')
+
+    with op.batch_alter_table('likes', schema=None) as batch_op:
+        batch_op.drop_index('ix_likes_activity_id')
+        batch_op.drop_constraint('unique_like', type_='unique')
@@ -0,0 +1,74 @@
+"""add user search indexes
+
+Revision ID: f2d97a4c8e61
+Revises: e6a0f3b9c127
+Create Date: 2026-10-17 12:20:09.481530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d97a4c8e61'
+down_revision = 'e6a0f3b9c127'
+branch_labels = None
+depends_on = None
+
+
+def _sqlite_has_fts5(bind):
+    options = {row[0] for row in bind.exec_driver_sql('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        # Trigram GIN indexes serve ILIKE '%q%' and similarity() lookups
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column_name in ('username', 'location', 'bio'):
+            op.execute(
+                f'CREATE INDEX IF NOT EXISTS ix_users_{column_name}_trgm '
+                f'ON users USING gin ({column_name} gin_trgm_ops)'
+            )
+
+    elif bind.dialect.name == 'sqlite' and _sqlite_has_fts5(bind):
+        # External-content FTS5 table kept in step with users by triggers
+        op.execute(
+            "CREATE VIRTUAL TABLE users_fts USING fts5("
+            "username, location, bio, content='users', content_rowid='id')"
+        )
+        op.execute(
+            "CREATE TRIGGER users_fts_ai AFTER INSERT ON users BEGIN "
+            "INSERT INTO users_fts(rowid, username, location, bio) "
+            "VALUES (new.id, new.username, new.location, new.bio); END"
+        )
+        op.execute(
+            "CREATE TRIGGER users_fts_ad AFTER DELETE ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, username, location, bio) "
+            "VALUES ('delete', old.id, old.username, old.location, old.bio); END"
+        )
+        op.execute(
+            # Only the indexed columns; counters and reset tokens are written far more often
+            "CREATE TRIGGER users_fts_au AFTER UPDATE OF username, location, bio ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, username, location, bio) "
+            "VALUES ('delete', old.id, old.username, old.location, old.bio); "
+            "INSERT INTO users_fts(rowid, username, location, bio) "
+            "VALUES (new.id, new.username, new.location, new.bio); END"
+        )
+        op.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        for column_name in ('username', 'location', 'bio'):
+            op.execute(f'DROP INDEX IF EXISTS ix_users_{column_name}_trgm')
+
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS users_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS users_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS users_fts_ai')
+        op.execute('DROP TABLE IF EXISTS users_fts')
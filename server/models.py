@@ -1,9 +1,10 @@
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import validates
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint
 from datetime import datetime, timedelta
 from config import db
-import bcrypt
+from passwords import hash_password, check_password, needs_rehash
 import secrets
 
 # Models go here!
@@ -24,6 +25,8 @@ class User(db.Model, SerializerMixin):
     instagram = db.Column(db.String)
     reset_token = db.Column(db.String)
     reset_token_expires = db.Column(db.DateTime)
+    # Maintained on follow/unfollow so timeline fan-out decisions never count follow rows
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationships
     activities = db.relationship('Activity', back_populates='user')
@@ -46,6 +49,10 @@ class User(db.Model, SerializerMixin):
         cascade='all, delete-orphan'
     )
 
+    __table_args__ = (
+        db.Index('ix_users_reset_token', 'reset_token'),
+    )
+
     # Serialization rules to avoid circular references
     serialize_rules = (
         '-activities',
@@ -57,13 +64,16 @@ class User(db.Model, SerializerMixin):
 
     # Password methods
     def set_password(self, password):
-        """Hash and set the user's password"""
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        self.password_hash = password_hash.decode('utf-8')
+        """Hash and set the user's password; raises PasswordHashBusy when hashing is saturated"""
+        self.password_hash = hash_password(password)
 
     def authenticate(self, password):
-        """Verify the user's password"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        """Verify the user's password; raises PasswordHashBusy when hashing is saturated"""
+        return check_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        """Whether the stored hash uses an outdated bcrypt cost"""
+        return needs_rehash(self.password_hash)
     
     def generate_reset_token(self):
         """Generate a secure password reset token"""
@@ -138,13 +148,27 @@ class Activity(db.Model, SerializerMixin):
     photos = db.Column(db.String)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
 
+    # Denormalized counters, kept in step by the like and comment endpoints
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Relationships
     comments = db.relationship('Comment', back_populates='activity', cascade='all, delete-orphan')
     user = db.relationship('User', back_populates='activities')
     likes = db.relationship('Like', back_populates='activity', cascade='all, delete-orphan')
+    photo_items = db.relationship(
+        'ActivityPhoto', back_populates='activity', cascade='all, delete-orphan',
+        order_by='ActivityPhoto.position'
+    )
+
+    # Composite index backing the feed's keyset pagination (newest first per author);
+    # it also serves lookups by user_id
+    __table_args__ = (
+        db.Index('ix_activities_user_id_datetime_id', 'user_id', 'datetime', 'id'),
+    )
 
     # Serialization rules to avoid circular references
-    serialize_rules = ('-comments','-user.activities', '-user.comments')
+    serialize_rules = ('-comments','-user.activities', '-user.comments', '-photo_items')
 
     # Validation methods
     @validates('title')
@@ -220,6 +244,11 @@ class Comment(db.Model, SerializerMixin):
     activity = db.relationship('Activity', back_populates='comments')
     user = db.relationship('User', back_populates='comments')
 
+    __table_args__ = (
+        db.Index('ix_comments_activity_id', 'activity_id'),
+        db.Index('ix_comments_user_id', 'user_id'),
+    )
+
     # Serialization rules to avoid circular references
     serialize_rules = ('-activity.comments', '-user.activities','-user.comments')
 
@@ -258,6 +287,12 @@ class Like(db.Model, SerializerMixin):
     user = db.relationship('User', back_populates='likes')
     activity = db.relationship('Activity', back_populates='likes')
 
+    # The unique constraint also serves lookups by user_id
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'activity_id', name='unique_like'),
+        db.Index('ix_likes_activity_id', 'activity_id'),
+    )
+
     # Serialization rules to avoid circular references
     serialize_rules = ('-user.likes', '-user.activities', '-user.comments', 
                       '-activity.likes', '-activity.comments', '-activity.user')
@@ -290,8 +325,10 @@ class Follow(db.Model, SerializerMixin):
     follower = db.relationship('User', foreign_keys=[follower_id], back_populates='following')
     followed = db.relationship('User', foreign_keys=[followed_id], back_populates='followers')
 
+    # The unique constraint also serves lookups by follower_id
     __table_args__ = (
         db.UniqueConstraint('follower_id', 'followed_id', name='unique_follow'),
+        db.Index('ix_follows_followed_id', 'followed_id'),
     )
 
     # Serialization rules to avoid circular references
@@ -312,3 +349,116 @@ class Follow(db.Model, SerializerMixin):
     def __repr__(self):
         return f'<Follower: {self.follower_id}, Followed: {self.followed_id}>'
     
+
+# I keep a precomputed home feed per user here so reading the feed is a single range scan instead of an IN (...) over the follow graph
+class TimelineEntry(db.Model, SerializerMixin):
+    __tablename__ = 'timeline_entries'
+
+    # Database columns
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False)
+    activity_datetime = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'activity_id', name='unique_timeline_entry'),
+        db.Index('ix_timeline_entries_user_id_activity_datetime', 'user_id', 'activity_datetime', 'activity_id'),
+        db.Index('ix_timeline_entries_activity_id', 'activity_id'),
+        db.Index('ix_timeline_entries_author_id', 'author_id'),
+    )
+
+    def __repr__(self):
+        return f'<TimelineEntry User: {self.user_id}, Activity: {self.activity_id}, Datetime: {self.activity_datetime}>'
+
+
+# I track background optimization of uploaded images here so any worker can report whether an upload is ready
+class ImageJob(db.Model, SerializerMixin):
+    __tablename__ = 'image_jobs'
+
+    # Database columns
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String, unique=True, nullable=False)
+    # Where the original is kept, under its own format's extension, until optimization writes `filename`
+    source_filename = db.Column(db.String)
+    status = db.Column(db.String, nullable=False, default='pending')
+    error = db.Column(db.String)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ImageJob {self.filename}, Status: {self.status}>'
+
+
+# I count how many activity photos and profile images point at each stored upload, so files nothing uses can be cleaned up
+class UploadBlob(db.Model, SerializerMixin):
+    __tablename__ = 'upload_blobs'
+
+    # Database columns
+    id = db.Column(db.Integer, primary_key=True)
+    # Content hash of the uploaded bytes plus the stored extension
+    filename = db.Column(db.String, unique=True, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Filled in once optimization finishes, for the activity photos that use the upload
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    bytes = db.Column(db.Integer)
+    variants = db.Column(db.JSON)  # Variant name -> width, for the variants written
+    placeholder = db.Column(db.String)  # Tiny JPEG data URL shown while the photo loads
+    dominant_color = db.Column(db.String)  # '#rrggbb'
+
+    def __repr__(self):
+        return f'<UploadBlob {self.filename}, References: {self.ref_count}>'
+
+
+# I keep one row per activity photo here, in display order, so the feed gets photo counts, sizes and dimensions without parsing Activity.photos
+class ActivityPhoto(db.Model, SerializerMixin):
+    __tablename__ = 'activity_photos'
+
+    # Database columns
+    id = db.Column(db.Integer, primary_key=True)
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    url = db.Column(db.String, nullable=False)
+    # Set for photos stored in /uploads/; external URLs have no metadata
+    upload_filename = db.Column(db.String)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    bytes = db.Column(db.Integer)
+    variants = db.Column(db.JSON)
+    placeholder = db.Column(db.String)
+    dominant_color = db.Column(db.String)
+
+    # Relationships
+    activity = db.relationship('Activity', back_populates='photo_items')
+
+    # Serialization rules to avoid circular references
+    serialize_rules = ('-activity',)
+
+    __table_args__ = (
+        db.Index('ix_activity_photos_activity_id_position', 'activity_id', 'position'),
+        db.Index('ix_activity_photos_upload_filename', 'upload_filename'),
+    )
+
+    def __repr__(self):
+        return f'<ActivityPhoto Activity: {self.activity_id}, Position: {self.position}, URL: {self.url}>'
+
+
+# I sanity-check the schema here so a relationship lookup without an index gets flagged before it becomes a sequential scan
+def find_unindexed_relationship_columns():
+    """Return 'table.column' names that relationship loads filter on but no index, primary key or unique constraint leads with"""
+    unindexed = set()
+    for mapper in db.Model.registry.mappers:
+        for relationship in mapper.relationships:
+            for _, remote_column in relationship.local_remote_pairs:
+                table = remote_column.table
+                leading_columns = {list(index.columns)[0] for index in table.indexes}
+                leading_columns.update(
+                    list(constraint.columns)[0]
+                    for constraint in table.constraints
+                    if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint)) and len(constraint.columns)
+                )
+                if remote_column not in leading_columns:
+                    unindexed.add(f'{table.name}.{remote_column.name}')
+    return sorted(unindexed)
@@ -0,0 +1,84 @@
+"""
+Password hashing for Still Strava.
+
+bcrypt is deliberately slow (about 250 ms at cost 12), so hashing runs on
+a small thread pool rather than straight in the request:
+
+- bcrypt releases the GIL while it hashes, so with threaded or gevent
+  workers other requests keep running while a login waits for its hash.
+- At most `PASSWORD_HASH_WORKERS` hashes run at once per process, so a
+  login burst cannot take every CPU away from feed requests.
+- Once `PASSWORD_HASH_MAX_PENDING` more are waiting, further requests
+  fail fast with `PasswordHashBusy`, which the endpoints turn into a
+  429, instead of queueing without bound.
+
+New hashes use `BCRYPT_ROUNDS`. A hash made with another cost still
+verifies, and `needs_rehash` tells the login endpoint to replace it.
+"""
+
+import os
+import threading
+
+import bcrypt
+
+from config import app
+from concurrency import make_thread_pool
+
+
+# Seconds a client should wait before retrying after a 429
+RETRY_AFTER_SECONDS = 1
+
+
+class PasswordHashBusy(RuntimeError):
+    """Raised when too many password hashes are already running or waiting"""
+
+
+_executor = None
+_executor_pid = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Create the hashing pool on first use; rebuilt after a fork, since threads do not survive one"""
+    global _executor, _executor_pid, _slots
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                workers = app.config['PASSWORD_HASH_WORKERS']
+                _executor = make_thread_pool(workers, thread_name_prefix='bcrypt')
+                _slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_MAX_PENDING'])
+                _executor_pid = os.getpid()
+    return _executor, _slots
+
+
+def _run(fn, *args):
+    """Run `fn` on the hashing pool and wait for it, or raise PasswordHashBusy if the pool is full"""
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHashBusy("Too many sign-in attempts right now; please try again shortly")
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    """Return a bcrypt hash of `password` at the configured cost"""
+    rounds = app.config['BCRYPT_ROUNDS']
+    return _run(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))).decode('utf-8')
+
+
+def check_password(password, password_hash):
+    """Whether `password` matches `password_hash`"""
+    return _run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def needs_rehash(password_hash):
+    """Whether `password_hash` was made with a cost other than BCRYPT_ROUNDS"""
+    # bcrypt hashes look like $2b$12$<salt and hash>; the third field is the cost
+    try:
+        rounds = int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != app.config['BCRYPT_ROUNDS']
@@ -0,0 +1,50 @@
+"""
+Release-phase tasks for Still Strava.
+
+Importing the app never touches the schema, so web workers boot without
+taking Alembic's lock or querying the database. Migrations run once
+per deploy instead, before any new worker starts:
+
+- `flask release`: the Procfile `release:` process (Heroku), or
+  Railway's pre-deploy command. Applies migrations
+  and refreshes the username autocomplete snapshot so new workers load
+  it instead of querying the users table. It also checks that Pillow
+  can write `IMAGE_OUTPUT_FORMAT`; web workers load Pillow lazily, so
+  they would only find out on the first upload.
+- `MIGRATE_ON_STARTUP` (default true): the gunicorn master runs
+  `flask release` once before forking workers, and `python app.py`
+  migrates before serving, so hosts without a release phase (Railway
+  ignores the Procfile's `release:`) still migrate. Set it to false
+  where a release phase already runs.
+"""
+
+import time
+
+from config import app, init_migrate
+from autocomplete import rebuild_username_index
+from image_jobs import get_alternate_formats
+
+
+def run_migrations():
+    """Apply pending Alembic migrations and return how long it took in seconds"""
+    start = time.perf_counter()
+    init_migrate()
+    from flask_migrate import upgrade
+    with app.app_context():
+        upgrade()
+    return time.perf_counter() - start
+
+
+@app.cli.command('release')
+def release_command():
+    """Apply database migrations and warm caches before new workers start."""
+    elapsed = run_migrations()
+    print(f"Database migrations completed in {elapsed:.2f}s.")
+
+    formats = ', '.join((app.config['IMAGE_OUTPUT_FORMAT'],) + get_alternate_formats())
+    print(f"Uploads will be encoded as {formats}.")
+
+    if app.config['AUTOCOMPLETE_SNAPSHOT_PATH']:
+        with app.app_context():
+            rebuild_username_index()
+        print("Username autocomplete snapshot refreshed.")
@@ -0,0 +1,120 @@
+"""
+User search backends for Still Strava.
+
+`/users/search` matches the query against username, location and bio and
+ranks usernames that start with the query first. How the match is done
+depends on the database:
+
+- **Postgres**: `pg_trgm` GIN indexes serve the substring match and
+  `similarity()` orders the results.
+- **SQLite**: the `users_fts` FTS5 table matches word prefixes and bm25
+  orders the results (development only).
+- **Anything else**, or a database whose migration has not created the
+  index yet: a plain case-insensitive substring scan.
+
+Set `USER_SEARCH_BACKEND` to `trigram`, `fts5` or `like` to force one.
+"""
+
+import re
+
+from sqlalchemy import case, column, func, inspect, or_, table, text
+
+from config import app, db
+from models import User
+
+
+class LikeUserSearch:
+    """Substring search that works everywhere but cannot use an index"""
+
+    name = 'like'
+
+    def _prefix_first(self, query):
+        return case((User.username.istartswith(query, autoescape=True), 0), else_=1)
+
+    def apply(self, stmt, query):
+        """Filter and order a select over User by relevance to `query`"""
+        return stmt.where(
+            or_(
+                User.username.icontains(query, autoescape=True),
+                User.location.icontains(query, autoescape=True),
+                User.bio.icontains(query, autoescape=True),
+            )
+        ).order_by(self._prefix_first(query), User.username)
+
+
+class TrigramUserSearch(LikeUserSearch):
+    """Postgres search served by pg_trgm GIN indexes and ranked by similarity"""
+
+    name = 'trigram'
+
+    def apply(self, stmt, query):
+        # ILIKE '%q%' and the % operator can both use the gin_trgm_ops indexes
+        return stmt.where(
+            or_(
+                User.username.icontains(query, autoescape=True),
+                User.username.op('%')(query),
+                User.location.icontains(query, autoescape=True),
+                User.bio.icontains(query, autoescape=True),
+            )
+        ).order_by(
+            self._prefix_first(query),
+            func.similarity(User.username, query).desc(),
+            User.username,
+        )
+
+
+class Fts5UserSearch(LikeUserSearch):
+    """SQLite search served by the users_fts FTS5 table and ranked by bm25"""
+
+    name = 'fts5'
+
+    users_fts = table('users_fts', column('rowid'), column('rank'))
+
+    def _match_expression(self, query):
+        # Quote every word so user input can never be read as FTS5 syntax, then prefix-match it
+        words = re.findall(r'\w+', query)
+        return ' '.join('"{}"*'.format(word) for word in words)
+
+    def apply(self, stmt, query):
+        match = self._match_expression(query)
+        if not match:
+            return stmt.where(False)
+        return (
+            stmt.join(self.users_fts, self.users_fts.c.rowid == User.id)
+            .where(text('users_fts MATCH :match').bindparams(match=match))
+            .order_by(self._prefix_first(query), self.users_fts.c.rank, User.username)
+        )
+
+
+USER_SEARCH_BACKENDS = {
+    backend.name: backend
+    for backend in (LikeUserSearch, TrigramUserSearch, Fts5UserSearch)
+}
+
+_backend = None
+
+
+def _detect_backend_name():
+    """Pick the best backend the connected database has been migrated for"""
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        index_names = {index['name'] for index in inspector.get_indexes('users')}
+        if 'ix_users_username_trgm' in index_names:
+            return 'trigram'
+    elif dialect == 'sqlite':
+        if inspector.has_table('users_fts'):
+            return 'fts5'
+    return 'like'
+
+
+def get_user_search_backend():
+    """Return the user search backend for this app, choosing it on first use"""
+    global _backend
+    if _backend is None:
+        name = app.config['USER_SEARCH_BACKEND']
+        if name == 'auto':
+            name = _detect_backend_name()
+        _backend = USER_SEARCH_BACKENDS[name]()
+        app.logger.info(f"User search backend: {_backend.name}")
+    return _backend
@@ -1,15 +1,21 @@
-from app import app
-from models import db, User, Activity, Comment, Like, Follow
+from app import app, recount_activity_counters, recount_follower_counts
+from models import db, User, Activity, ActivityPhoto, Comment, Like, Follow, TimelineEntry, UploadBlob, ImageJob
+from uploads import sync_activity_photos
+import timeline
 from datetime import datetime
 import random
 
 with app.app_context():
     print("Clearing db...")
+    TimelineEntry.query.delete()
     Follow.query.delete()
     User.query.delete()
+    ActivityPhoto.query.delete()
     Activity.query.delete()
     Comment.query.delete()
     Like.query.delete()
+    UploadBlob.query.delete()
+    ImageJob.query.delete()
     db.session.commit()
 
     print("Seeding users...")
@@ -101,6 +107,10 @@ with app.app_context():
     db.session.add_all(activities)
     db.session.commit()
 
+    for activity in activities:
+        sync_activity_photos(activity)
+    db.session.commit()
+
     print("Seeding comments...")
     comments = [
         Comment(
@@ -158,4 +168,14 @@ with app.app_context():
     ]
     db.session.add_all(follows)
     db.session.commit()
+
+    print("Counting likes, comments and followers...")
+    recount_activity_counters()
+    recount_follower_counts()
+    db.session.commit()
+
+    if timeline.timeline_enabled():
+        print("Building timelines...")
+        timeline.rebuild_timelines()
+        db.session.commit()
     print("✅ Done seeding!")
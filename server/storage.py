@@ -0,0 +1,209 @@
+"""
+Blob storage for Still Strava uploads.
+
+Every upload, size variant and alternate format is stored as a flat key
+(the file name). `UPLOAD_STORAGE` picks where the keys live:
+
+- `local` (default): files under `UPLOAD_FOLDER`. This only works with
+  a single web instance, or with a folder shared between instances.
+- `s3`: an S3-compatible bucket, so any number of instances share the
+  same uploads. `S3_ENDPOINT_URL` points it at MinIO or another
+  S3-compatible server instead of AWS, e.g. a local MinIO container in
+  development.
+
+Both backends have the same interface: `exists`, `save`, `delete`,
+`list`, `workspace` (a local path to optimize an upload in place) and
+either `local_path` (local) or `open` (S3) for serving.
+"""
+
+from contextlib import contextmanager
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.security import safe_join
+
+from config import app
+
+
+def guess_content_type(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+class LocalStorage:
+    """Uploads kept in a directory on this machine"""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        """Absolute path of `key`, or None if the key would escape the upload folder"""
+        return safe_join(os.path.abspath(self.root), key)
+
+    def exists(self, key):
+        path = self.local_path(key)
+        return path is not None and os.path.isfile(path)
+
+    def save(self, key, fileobj, content_type=None):
+        """Write `fileobj` to `key`, atomically so readers never see half a file"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.local_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.upload"
+        with open(temp_path, 'wb') as out:
+            shutil.copyfileobj(fileobj, out, 1 << 20)
+        os.replace(temp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix):
+        """Return the keys that start with `prefix`"""
+        try:
+            return [name for name in os.listdir(self.root) if name.startswith(prefix)]
+        except FileNotFoundError:
+            return []
+
+    @contextmanager
+    def workspace(self, key):
+        """Yield a path to `key`; files written next to it are stored as they are written"""
+        yield self.local_path(key)
+
+
+class S3Storage:
+    """Uploads kept in an S3-compatible bucket"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None,
+                 access_key_id=None, secret_access_key=None,
+                 max_pool_connections=10, multipart_chunk_mb=8):
+        # boto3 is only needed when S3 storage is switched on
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.prefix = prefix
+        # One client per process: it keeps a pool of keep-alive HTTPS connections
+        self.client = boto3.session.Session().client(
+            's3',
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={'max_attempts': 3, 'mode': 'standard'},
+                # MinIO and most S3-compatible servers need path-style URLs
+                s3={'addressing_style': 'path' if endpoint_url else 'auto'},
+            ),
+        )
+        # Files over one chunk are sent as a multipart upload, streamed chunk by chunk
+        chunk_size = multipart_chunk_mb * 1024 * 1024
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size,
+            multipart_chunksize=chunk_size,
+            max_concurrency=4,
+            use_threads=True,
+        )
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def local_path(self, key):
+        return None
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def save(self, key, fileobj, content_type=None):
+        self.client.upload_fileobj(
+            fileobj, self.bucket, self._key(key),
+            ExtraArgs={'ContentType': content_type or guess_content_type(key)},
+            Config=self.transfer_config,
+        )
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self, prefix):
+        keys = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            keys.extend(item['Key'][len(self.prefix):] for item in page.get('Contents', []))
+        return keys
+
+    def open(self, key, range_header=None):
+        """Return the `get_object` response for `key`, optionally for a byte range; Body streams the bytes"""
+        from botocore.exceptions import ClientError
+        kwargs = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if range_header:
+            kwargs['Range'] = range_header
+        try:
+            return self.client.get_object(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'InvalidRange':
+                raise RequestedRangeNotSatisfiable()
+            raise
+
+    @contextmanager
+    def workspace(self, key):
+        """
+        Download `key` to a scratch folder and yield its path. On exit, every
+        file in the folder (the rewritten original plus any variants written
+        next to it) is uploaded back.
+        """
+        scratch = tempfile.mkdtemp(prefix='upload-')
+        try:
+            path = os.path.join(scratch, key)
+            self.client.download_file(self.bucket, self._key(key), path, Config=self.transfer_config)
+            yield path
+            for name in os.listdir(scratch):
+                with open(os.path.join(scratch, name), 'rb') as fileobj:
+                    self.save(name, fileobj)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+_storage = None
+_storage_pid = None
+_storage_lock = threading.Lock()
+
+
+def get_upload_storage():
+    """Return this process's upload storage, creating it on first use"""
+    global _storage, _storage_pid
+    # Rebuild after a fork: HTTP connection pools must not be shared between processes
+    if _storage is None or _storage_pid != os.getpid():
+        with _storage_lock:
+            if _storage is None or _storage_pid != os.getpid():
+                if app.config['UPLOAD_STORAGE'] == 's3':
+                    _storage = S3Storage(
+                        bucket=app.config['S3_BUCKET'],
+                        prefix=app.config['S3_PREFIX'],
+                        endpoint_url=app.config['S3_ENDPOINT_URL'],
+                        region=app.config['S3_REGION'],
+                        access_key_id=app.config['S3_ACCESS_KEY_ID'],
+                        secret_access_key=app.config['S3_SECRET_ACCESS_KEY'],
+                        max_pool_connections=app.config['S3_MAX_POOL_CONNECTIONS'],
+                        multipart_chunk_mb=app.config['S3_MULTIPART_CHUNK_MB'],
+                    )
+                else:
+                    _storage = LocalStorage(app.config['UPLOAD_FOLDER'])
+                _storage_pid = os.getpid()
+    return _storage
@@ -0,0 +1,192 @@
+"""
+Materialized home timelines for Still Strava.
+
+When `TIMELINE_ENABLED` is set, each new activity is copied into the
+`timeline_entries` of every follower (fan-out on write), so reading a
+home feed becomes a single indexed range scan on
+`(user_id, activity_datetime, activity_id)`.
+
+- Each timeline keeps at most `TIMELINE_MAX_ENTRIES` rows; anything older
+  is read straight from the activities table.
+- Authors with more than `TIMELINE_FANOUT_MAX_FOLLOWERS` followers are not
+  fanned out. Their activities are merged in at read time instead. Both
+  decisions read the maintained `users.follower_count`.
+
+Callers own the transaction: these helpers only stage changes on
+`db.session` and never commit.
+"""
+
+from sqlalchemy import select, delete, insert, bindparam, literal, tuple_
+
+from config import app, db
+from models import Activity, Follow, TimelineEntry, User
+
+
+def timeline_enabled():
+    """Return True when fan-out on write is switched on"""
+    return app.config['TIMELINE_ENABLED']
+
+
+def _is_high_fanout(author_id):
+    """Check whether an author has too many followers to fan out on write"""
+    follower_count = db.session.execute(select(User.follower_count).where(User.id == author_id)).scalar()
+    return (follower_count or 0) > app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']
+
+
+def high_fanout_author_ids(author_ids):
+    """Return the authors among `author_ids` whose activities are read on demand rather than fanned out"""
+    if not author_ids:
+        return []
+    stmt = select(User.id).where(
+        User.id.in_(author_ids),
+        User.follower_count > app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']
+    )
+    return list(db.session.execute(stmt).scalars())
+
+
+def trim_timelines(user_ids):
+    """Drop the oldest entries of each of `user_ids`' timelines beyond the configured cap"""
+    if not user_ids:
+        return
+    # The first entry past the cap in each timeline, found by stepping down its index;
+    # timelines still under the cap have none and are left alone
+    first_overflow = (
+        select(TimelineEntry.id)
+        .where(TimelineEntry.user_id == User.id)
+        .order_by(TimelineEntry.activity_datetime.desc(), TimelineEntry.activity_id.desc())
+        .offset(app.config['TIMELINE_MAX_ENTRIES'])
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    cutoffs = db.session.execute(
+        select(TimelineEntry.user_id, TimelineEntry.activity_datetime, TimelineEntry.activity_id)
+        .where(TimelineEntry.id.in_(select(first_overflow).where(User.id.in_(set(user_ids)))))
+    ).all()
+    if not cutoffs:
+        return
+
+    # Only rows past each cutoff are touched, in one executemany
+    entries = TimelineEntry.__table__
+    db.session.execute(
+        delete(entries).where(
+            entries.c.user_id == bindparam('cutoff_user_id'),
+            tuple_(entries.c.activity_datetime, entries.c.activity_id)
+            <= tuple_(
+                bindparam('cutoff_datetime', type_=entries.c.activity_datetime.type),
+                bindparam('cutoff_activity_id', type_=entries.c.activity_id.type)
+            )
+        ),
+        [
+            {'cutoff_user_id': user_id, 'cutoff_datetime': activity_datetime, 'cutoff_activity_id': activity_id}
+            for user_id, activity_datetime, activity_id in cutoffs
+        ]
+    )
+
+
+def fan_out_activity(activity):
+    """Copy a new activity into its author's timeline and, for most authors, every follower's timeline"""
+    if not timeline_enabled():
+        return
+
+    recipient_ids = [activity.user_id]
+    if not _is_high_fanout(activity.user_id):
+        follower_stmt = select(Follow.follower_id).where(Follow.followed_id == activity.user_id)
+        recipient_ids.extend(db.session.execute(follower_stmt).scalars())
+
+    db.session.execute(insert(TimelineEntry), [
+        {
+            'user_id': recipient_id,
+            'author_id': activity.user_id,
+            'activity_id': activity.id,
+            'activity_datetime': activity.datetime
+        }
+        for recipient_id in recipient_ids
+    ])
+    trim_timelines(recipient_ids)
+
+
+def backfill_follow(follower_id, followed_id):
+    """Copy the most recent activities of a newly followed user into the follower's timeline"""
+    if not timeline_enabled() or _is_high_fanout(followed_id):
+        return
+
+    recent = (
+        select(
+            literal(follower_id),
+            Activity.user_id,
+            Activity.id,
+            Activity.datetime
+        )
+        .where(Activity.user_id == followed_id)
+        .order_by(Activity.datetime.desc(), Activity.id.desc())
+        .limit(app.config['TIMELINE_MAX_ENTRIES'])
+    )
+    db.session.execute(
+        insert(TimelineEntry).from_select(
+            ['user_id', 'author_id', 'activity_id', 'activity_datetime'],
+            recent
+        )
+    )
+    trim_timelines([follower_id])
+
+
+def prune_follow(follower_id, followed_id):
+    """Remove an unfollowed user's activities from the follower's timeline"""
+    if not timeline_enabled():
+        return
+    db.session.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.user_id == follower_id,
+            TimelineEntry.author_id == followed_id
+        )
+    )
+
+
+def remove_activity(activity_id):
+    """Remove a deleted activity from every timeline it was fanned out to"""
+    db.session.execute(delete(TimelineEntry).where(TimelineEntry.activity_id == activity_id))
+
+
+def remove_user(user_id):
+    """Remove a deleted user's own timeline and their activities from everyone else's"""
+    db.session.execute(delete(TimelineEntry).where(TimelineEntry.user_id == user_id))
+    db.session.execute(delete(TimelineEntry).where(TimelineEntry.author_id == user_id))
+
+
+def select_timeline_page(user_id, cursor, limit):
+    """Read up to `limit` activities from a user's materialized timeline, newest first, after `cursor`"""
+    stmt = (
+        select(Activity)
+        .join(TimelineEntry, TimelineEntry.activity_id == Activity.id)
+        .where(TimelineEntry.user_id == user_id)
+        .order_by(TimelineEntry.activity_datetime.desc(), TimelineEntry.activity_id.desc())
+        .limit(limit)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(TimelineEntry.activity_datetime, TimelineEntry.activity_id) < cursor)
+    return stmt
+
+
+def rebuild_timelines():
+    """Rebuild every user's timeline from the follow graph"""
+    db.session.execute(delete(TimelineEntry))
+    follows = db.session.execute(select(Follow.follower_id, Follow.followed_id)).all()
+    user_ids = set(db.session.execute(select(Activity.user_id).distinct()).scalars())
+    for user_id in user_ids:
+        if user_id is not None:
+            backfill_follow(user_id, user_id)
+    for follower_id, followed_id in follows:
+        backfill_follow(follower_id, followed_id)
+    return len(follows)
+
+
+@app.cli.command('rebuild-timelines')
+def rebuild_timelines_command():
+    """Rebuild all materialized home timelines."""
+    if not timeline_enabled():
+        print("TIMELINE_ENABLED is off; nothing to rebuild.")
+        return
+    edges = rebuild_timelines()
+    db.session.commit()
+    print(f"Rebuilt timelines from {edges} follow edges.")
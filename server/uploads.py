@@ -0,0 +1,355 @@
+"""
+Content-addressed upload storage for Still Strava.
+
+Each upload is stored as `<sha256 of its bytes><ext>`, so uploading the
+same photo twice (client retries do this a lot) reuses the stored file
+and its optimization job instead of saving and optimizing it again.
+Optimization is deterministic, so identical uploads always produce
+identical optimized files, and the URL can be returned before the
+background job has finished.
+
+`upload_blobs.ref_count` counts the activity photos and profile images
+that point at each file. Endpoints that change `Activity.photos` or
+`User.image` call `adjust_upload_refs` in the same transaction.
+`flask gc-uploads` recounts the references from scratch and deletes
+files nothing has referenced for `UPLOAD_GC_GRACE_HOURS`. The grace
+period covers photos uploaded before the activity using them is saved.
+
+Base64 `data:` URLs embedded in `Activity.photos` are stored as uploads
+too, on write (or refused, see `ACTIVITY_PHOTO_DATA_URLS`) and in bulk
+by `flask externalize-photos`, so activity rows stay small.
+
+`activity_photos` holds one row per photo in `Activity.photos`, with the
+dimensions, size, variants and placeholder recorded when its upload was
+optimized. Uploads optimized before those were recorded get theirs from
+`flask backfill-photo-metadata`, which reads the stored files.
+Endpoints that change `Activity.photos` call `sync_activity_photos`.
+
+`store_upload` commits the new upload; the reference-count helpers only
+stage changes on `db.session` and leave the commit to their callers.
+"""
+
+import base64
+import binascii
+from collections import Counter
+from datetime import datetime, timedelta
+import hashlib
+import io
+import re
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import app, db
+from models import Activity, ActivityPhoto, ImageJob, UploadBlob, User
+from image_jobs import check_upload_size, get_image_job, submit_image_optimization, upload_suffix
+from storage import get_upload_storage
+from utils.image_utils import ImageTooLarge, read_image_info
+
+
+# Matches relative and absolute content-addressed upload URLs, e.g. /uploads/ab12...ef.jpg?size=thumb
+UPLOAD_URL_PATTERN = re.compile(r'/uploads/([0-9a-f]{64}\.[a-z0-9]+)')
+# The header of a base64 image data URL, e.g. data:image/jpeg;base64,
+DATA_URL_PATTERN = re.compile(r'data:(image/[\w.+-]+)(?:;[\w=.+-]+)*;base64,', re.IGNORECASE)
+EXTERNALIZE_BATCH_SIZE = 100
+METADATA_BATCH_SIZE = 100
+
+
+class InvalidPhoto(ValueError):
+    """Raised for an embedded photo that cannot be stored"""
+
+
+def upload_filenames(*values):
+    """Return the upload filenames referenced by photo strings or image URLs, one per reference"""
+    filenames = []
+    for value in values:
+        if value:
+            filenames.extend(UPLOAD_URL_PATTERN.findall(value))
+    return filenames
+
+
+def adjust_upload_refs(old_value, new_value):
+    """Move references from the uploads in `old_value` to those in `new_value`"""
+    deltas = Counter(upload_filenames(new_value))
+    deltas.subtract(upload_filenames(old_value))
+    for filename, delta in deltas.items():
+        if delta:
+            db.session.execute(
+                update(UploadBlob)
+                .where(UploadBlob.filename == filename)
+                .values(ref_count=UploadBlob.ref_count + delta)
+            )
+
+
+def _hash_stream(stream):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1 << 20), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def store_upload(stream, content_type=None, source_suffix=None):
+    """
+    Store an uploaded image under its content hash and return `(filename, job)`.
+    `source_suffix` is the extension of the image's actual format (see
+    `check_upload_size`); the original is kept under it until it is optimized.
+    """
+    digest = _hash_stream(stream)
+    filename = f"{digest}{upload_suffix()}"
+    source_filename = None
+    if source_suffix and source_suffix != upload_suffix():
+        source_filename = f"{digest}{source_suffix}"
+    storage = get_upload_storage()
+
+    blob = UploadBlob.query.filter_by(filename=filename).first()
+    if blob:
+        # Uploaded again: restart its grace period so gc-uploads keeps it until it is used
+        blob.created_at = datetime.utcnow()
+    job = get_image_job(filename)
+    if job and (storage.exists(filename) or (job.source_filename and storage.exists(job.source_filename))):
+        # Same bytes as an earlier upload: reuse its file and optimization
+        db.session.commit()
+        return filename, job
+
+    claimed = job is None
+    if claimed:
+        # Claim the filename first, so only the request whose insert wins writes the file
+        if blob is None:
+            db.session.add(UploadBlob(filename=filename))
+        db.session.add(ImageJob(filename=filename, source_filename=source_filename))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # An identical upload claimed it first and is writing the file
+            db.session.rollback()
+            return filename, get_image_job(filename)
+
+    try:
+        storage.save(source_filename or filename, stream, content_type)
+    except Exception:
+        if claimed:
+            # Give the claim up so the next upload of these bytes can write the file
+            db.session.rollback()
+            ImageJob.query.filter_by(filename=filename).delete()
+            if blob is None:
+                UploadBlob.query.filter_by(filename=filename).delete()
+            db.session.commit()
+        raise
+
+    return filename, submit_image_optimization(filename, source_filename)
+
+
+def split_photos(photos):
+    """Split an `Activity.photos` string into URLs, the same way the client does"""
+    if not photos:
+        return []
+    if '|||' in photos:
+        parts = photos.split('|||')
+    elif photos.startswith('data:'):
+        # Data URLs contain commas, so a lone one is never split
+        parts = [photos]
+    else:
+        parts = photos.split(',')
+    return [part.strip() for part in parts if part.strip()]
+
+
+def sync_activity_photos(activity):
+    """Rebuild `activity.photo_items` from `activity.photos`, copying each upload's stored metadata"""
+    photos = []
+    for url in split_photos(activity.photos):
+        # Data URLs only remain when they could not be stored; they get no row
+        if url.startswith('data:'):
+            continue
+        match = UPLOAD_URL_PATTERN.search(url)
+        photos.append((url, match.group(1) if match else None))
+
+    filenames = {filename for _, filename in photos if filename}
+    blobs = {}
+    if filenames:
+        blobs = {
+            blob.filename: blob
+            for blob in UploadBlob.query.filter(UploadBlob.filename.in_(filenames))
+        }
+
+    items = []
+    for position, (url, filename) in enumerate(photos):
+        blob = blobs.get(filename)
+        items.append(ActivityPhoto(
+            position=position,
+            url=url,
+            upload_filename=filename,
+            width=blob.width if blob else None,
+            height=blob.height if blob else None,
+            bytes=blob.bytes if blob else None,
+            variants=blob.variants if blob else None,
+            placeholder=blob.placeholder if blob else None,
+            dominant_color=blob.dominant_color if blob else None,
+        ))
+    activity.photo_items = items
+
+
+def store_data_url(data_url):
+    """Store the image in a base64 data URL as an upload and return its /uploads/ URL"""
+    match = DATA_URL_PATTERN.match(data_url)
+    if not match:
+        raise InvalidPhoto("Only base64-encoded image data URLs can be stored")
+    try:
+        data = base64.b64decode(data_url[match.end():], validate=True)
+    except binascii.Error:
+        raise InvalidPhoto("Photo data URL is not valid base64")
+
+    stream = io.BytesIO(data)
+    source_suffix = check_upload_size(stream)
+    filename, _ = store_upload(stream, match.group(1), source_suffix)
+    return f"/uploads/{filename}"
+
+
+def externalize_photo_data_urls(photos):
+    """Return `photos` with every embedded data URL replaced by the URL of a stored upload"""
+    if not photos or 'data:' not in photos:
+        return photos
+    urls = [store_data_url(url) if url.startswith('data:') else url for url in split_photos(photos)]
+    return '|||'.join(urls)
+
+
+def prepare_activity_photos(photos):
+    """
+    Get a `photos` value from the client ready to save: embedded data URLs are
+    stored as uploads, or refused when `ACTIVITY_PHOTO_DATA_URLS` is `reject`.
+    Raises InvalidPhoto or ImageTooLarge.
+    """
+    if photos is not None and not isinstance(photos, str):
+        raise InvalidPhoto("photos must be a string of image URLs")
+    if photos and 'data:' in photos and app.config['ACTIVITY_PHOTO_DATA_URLS'] == 'reject':
+        raise InvalidPhoto("Upload photos with /upload-image and send their URLs instead of data URLs")
+    return externalize_photo_data_urls(photos)
+
+
+def recount_upload_refs():
+    """Recompute every blob's ref_count from activity photos and profile images"""
+    counts = Counter()
+    for photos in db.session.execute(select(Activity.photos).where(Activity.photos.contains('/uploads/'))).scalars():
+        counts.update(upload_filenames(photos))
+    for image in db.session.execute(select(User.image).where(User.image.contains('/uploads/'))).scalars():
+        counts.update(upload_filenames(image))
+
+    db.session.execute(update(UploadBlob).values(ref_count=0))
+    for filename, count in counts.items():
+        db.session.execute(
+            update(UploadBlob).where(UploadBlob.filename == filename).values(ref_count=count)
+        )
+
+
+def collect_unreferenced_uploads(grace):
+    """Delete blobs that nothing references and that are older than `grace`; return how many went"""
+    cutoff = datetime.utcnow() - grace
+    blobs = UploadBlob.query.filter(UploadBlob.ref_count <= 0, UploadBlob.created_at < cutoff).all()
+    storage = get_upload_storage()
+    for blob in blobs:
+        # The content hash prefix also covers every size variant and alternate format
+        stem = blob.filename.split('.', 1)[0]
+        for key in storage.list(f"{stem}."):
+            storage.delete(key)
+        ImageJob.query.filter_by(filename=blob.filename).delete()
+        db.session.delete(blob)
+    return len(blobs)
+
+
+def externalize_activity_photos():
+    """Store the data URLs embedded in every activity as uploads; return (converted, failed) counts"""
+    converted = failed = 0
+    last_id = 0
+    while True:
+        # Walk in id order, a batch at a time, so only a few large rows are in memory at once
+        rows = db.session.execute(
+            select(Activity.id, Activity.photos)
+            .where(Activity.photos.contains('data:'), Activity.id > last_id)
+            .order_by(Activity.id)
+            .limit(EXTERNALIZE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for activity_id, photos in rows:
+            last_id = activity_id
+            try:
+                new_photos = externalize_photo_data_urls(photos)
+            except (InvalidPhoto, ImageTooLarge) as e:
+                app.logger.warning(f"Could not externalize photos of activity {activity_id}: {e}")
+                failed += 1
+                continue
+            activity = db.session.get(Activity, activity_id)
+            activity.photos = new_photos
+            sync_activity_photos(activity)
+            adjust_upload_refs(photos, new_photos)
+            converted += 1
+        db.session.commit()
+        # Let go of the batch's rows before loading the next one
+        db.session.expunge_all()
+    return converted, failed
+
+
+def backfill_upload_metadata():
+    """Record the dimensions, size and placeholder of uploads that have none; return (filled, unreadable) counts"""
+    storage = get_upload_storage()
+    filled = unreadable = 0
+    last_id = 0
+    while True:
+        blobs = (
+            UploadBlob.query
+            .filter(UploadBlob.width.is_(None), UploadBlob.id > last_id)
+            .order_by(UploadBlob.id)
+            .limit(METADATA_BATCH_SIZE)
+            .all()
+        )
+        if not blobs:
+            break
+        for blob in blobs:
+            last_id = blob.id
+            info = None
+            if storage.exists(blob.filename):
+                with storage.workspace(blob.filename) as file_path:
+                    info = read_image_info(file_path)
+            if info is None:
+                unreadable += 1
+                continue
+            metadata = {
+                'width': info.width,
+                'height': info.height,
+                'bytes': info.bytes,
+                'placeholder': info.placeholder,
+                'dominant_color': info.dominant_color,
+            }
+            db.session.execute(update(UploadBlob).where(UploadBlob.id == blob.id).values(**metadata))
+            db.session.execute(
+                update(ActivityPhoto)
+                .where(ActivityPhoto.upload_filename == blob.filename, ActivityPhoto.width.is_(None))
+                .values(**metadata)
+            )
+            filled += 1
+        db.session.commit()
+        db.session.expunge_all()
+    return filled, unreadable
+
+
+@app.cli.command('externalize-photos')
+def externalize_photos_command():
+    """Move base64 photos embedded in activities.photos into stored uploads."""
+    converted, failed = externalize_activity_photos()
+    print(f"Externalized photos of {converted} activities ({failed} failed).")
+
+
+@app.cli.command('backfill-photo-metadata')
+def backfill_photo_metadata_command():
+    """Read the stored files of uploads with no recorded dimensions and fill them in."""
+    filled, unreadable = backfill_upload_metadata()
+    print(f"Recorded metadata for {filled} uploads ({unreadable} missing or unreadable).")
+
+
+@app.cli.command('gc-uploads')
+def gc_uploads_command():
+    """Recount upload references and delete uploads nothing uses."""
+    recount_upload_refs()
+    removed = collect_unreferenced_uploads(timedelta(hours=app.config['UPLOAD_GC_GRACE_HOURS']))
+    db.session.commit()
+    print(f"Removed {removed} unreferenced uploads.")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+"""
+Throughput benchmark for Still Strava's server profiles.
+
+Starts the server once per profile (the gunicorn profiles from
+gunicorn.conf.py, or the ASGI entry point under uvicorn), seeds a few
+users and activities, then runs concurrent clients against the feed
+(`GET /activities`) and login (`POST /login`) endpoints and reports
+requests per second, latency percentiles and status codes.
+
+Run from server/, for example:
+
+    python utils/benchmark_server.py --profiles sync,gthread,gevent,asgi --concurrency 32
+
+Each profile gets a fresh SQLite database unless `--database-url` is
+given. Results are only comparable on the same machine; the load
+generator shares the CPU with the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+PROFILES = ("sync", "gthread", "gevent", "asgi")
+
+
+@dataclass
+class Result:
+    """Latencies and status codes collected for one endpoint."""
+
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def add(self, latency: float, status: int) -> None:
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, body: Optional[dict] = None):
+    payload = json.dumps(body) if body is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def start_server(profile: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    """Start the server for `profile` and wait until it answers."""
+
+    if profile == "asgi":
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:application",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+               "--log-level", "warning"]
+        env = dict(env, GUNICORN_PROFILE=profile, GUNICORN_WORKERS=str(workers))
+    process = subprocess.Popen(cmd, cwd=SERVER_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{profile} server exited: {process.stderr.read().decode()[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            _request(conn, "GET", "/activities?limit=1")
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{profile} server did not start within 60 s")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def seed(port: int, users: int, activities: int) -> List[int]:
+    """Create users and activities to serve; return the user ids."""
+
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    user_ids = []
+    for i in range(users):
+        status, data = _request(conn, "POST", "/signup", {
+            "username": f"bench{i}", "email": f"bench{i}@example.com", "password": "benchmark",
+        })
+        if status == 201:
+            user_ids.append(json.loads(data)["user"]["id"])
+        else:
+            # Already seeded (a shared --database-url)
+            status, data = _request(conn, "POST", "/login", {
+                "email": f"bench{i}@example.com", "password": "benchmark",
+            })
+            user_ids.append(json.loads(data)["user"]["id"])
+    for i in range(activities):
+        _request(conn, "POST", "/activities", {
+            "title": f"Benchmark walk {i}",
+            "activity_type": "walk",
+            "description": "A slow walk for the benchmark",
+            "user_id": user_ids[i % len(user_ids)],
+        })
+    conn.close()
+    return user_ids
+
+
+def run_load(port: int, endpoint: str, user_ids: List[int], concurrency: int, duration: float) -> Result:
+    """Hit `endpoint` from `concurrency` keep-alive clients for `duration` seconds."""
+
+    result = Result()
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(index: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        user_number = index % len(user_ids)
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                if endpoint == "feed":
+                    status, _ = _request(conn, "GET", f"/activities?user_id={user_ids[user_number]}")
+                else:
+                    status, _ = _request(conn, "POST", "/login", {
+                        "email": f"bench{user_number}@example.com", "password": "benchmark",
+                    })
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    result.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            with lock:
+                result.add(time.perf_counter() - start, status)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return result
+
+
+def format_result(profile: str, endpoint: str, result: Result, duration: float) -> str:
+    statuses = ", ".join(f"{status}: {count}" for status, count in sorted(result.statuses.items()))
+    return (
+        f"{profile:8} {endpoint:6} {len(result.latencies) / duration:8.1f} req/s  "
+        f"p50 {result.percentile(0.5) * 1000:7.1f} ms  p95 {result.percentile(0.95) * 1000:7.1f} ms  "
+        f"[{statuses}] errors: {result.errors}"
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare server profiles on the feed and login endpoints.")
+    parser.add_argument("--profiles", default="sync,gthread",
+                        help=f"Comma-separated profiles to run: {', '.join(PROFILES)} (default: sync,gthread)")
+    parser.add_argument("--endpoints", default="feed,login", help="Comma-separated endpoints: feed, login")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients (default: 16)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint (default: 10)")
+    parser.add_argument("--workers", type=int, default=2, help="Server worker processes (default: 2)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to run the server on (default: 8765)")
+    parser.add_argument("--users", type=int, default=20, help="Users to seed (default: 20)")
+    parser.add_argument("--activities", type=int, default=200, help="Activities to seed (default: 200)")
+    parser.add_argument("--database-url", help="Database to use instead of a fresh SQLite file per profile")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    for name in profiles:
+        if name not in PROFILES:
+            raise SystemExit(f"Unknown profile {name!r}; expected one of {', '.join(PROFILES)}")
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as scratch:
+        for profile in profiles:
+            env = dict(os.environ)
+            env["DATABASE_URL"] = args.database_url or f"sqlite:///{scratch}/{profile}.db"
+            env["AUTOCOMPLETE_SNAPSHOT_PATH"] = ""
+            env["UPLOAD_FOLDER"] = os.path.join(scratch, "uploads")
+
+            # Migrate up front so the workers do not race each other to do it
+            subprocess.run([sys.executable, "-m", "flask", "--app", "app", "db", "upgrade"],
+                           cwd=SERVER_DIR, env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            process = start_server(profile, args.port, args.workers, env)
+            try:
+                user_ids = seed(args.port, args.users, args.activities)
+                for endpoint in endpoints:
+                    result = run_load(args.port, endpoint, user_ids, args.concurrency, args.duration)
+                    print(format_result(profile, endpoint, result, args.duration), flush=True)
+            finally:
+                stop_server(process)
+
+
+if __name__ == "__main__":
+    main()
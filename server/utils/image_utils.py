@@ -20,30 +20,166 @@ with the existing client-side compression.
 
 from __future__ import annotations
 
+import base64
+import hashlib
+import io
+import json
 import logging
+import math
 import os
 import sys
+import time
 import zipfile
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Iterable, Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 
-from PIL import Image, UnidentifiedImageError
+if TYPE_CHECKING:
+    from PIL import Image
 
 
 # -------------------------------------------------
 # Configuration
 # -------------------------------------------------
 
-SUPPORTED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+SUPPORTED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif"}
+# Extension for each Pillow format name, for files stored before they are re-encoded
+FORMAT_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp", "AVIF": ".avif"}
+
+# Longest side of the inline placeholder; small enough to inline in API responses
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 50
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    """How to encode one output format."""
+
+    pil_format: str
+    suffix: str
+    mimetype: str
+    # Default quality, tuned so each format looks about the same as JPEG at 85
+    quality: int
+    params: Dict[str, object] = field(default_factory=dict)
+
+
+OUTPUT_FORMATS: Dict[str, OutputFormat] = {
+    "jpeg": OutputFormat("JPEG", ".jpg", "image/jpeg", 85, {"optimize": True}),
+    "webp": OutputFormat("WEBP", ".webp", "image/webp", 80, {"method": 6}),
+    "avif": OutputFormat("AVIF", ".avif", "image/avif", 60, {"speed": 6}),
+}
+
+
+@lru_cache(maxsize=None)
+def _pillow():
+    """
+    Import Pillow on first use and return its `Image` module.
+
+    The web app imports this module for its format table and path helpers
+    only; Pillow is loaded by the code that actually decodes or encodes.
+    """
+
+    from PIL import Image
+
+    try:  # AVIF support on Pillow releases that do not bundle it
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    return Image
+
+
+def format_supported(name: str) -> bool:
+    """Whether this Pillow build can write the `name` output format."""
+
+    Image = _pillow()
+    Image.init()
+    return name in OUTPUT_FORMATS and OUTPUT_FORMATS[name].pil_format in Image.SAVE
+
+
+def parse_formats(spec: Optional[str]) -> List[str]:
+    """Parse a comma-separated list of output format names such as ``"webp,avif"``."""
+
+    names = [name.strip().lower() for name in (spec or "").split(",") if name.strip()]
+    for name in names:
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown image format {name!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+    return names
 
 
 @dataclass
 class OptimizeOptions:
     """Tunable knobs for image optimization."""
 
-    quality: int = 85
+    # None uses the preset quality of each output format
+    quality: Optional[int] = None
     max_dim: Optional[int] = 1600
+    # Extra smaller copies to write next to each output, as {name: max_dim}
+    variants: Optional[Dict[str, int]] = None
+    output_format: str = "jpeg"
+    # Extra encodings written next to each output for clients that accept them
+    alternate_formats: Optional[List[str]] = None
+    # Inputs larger than this are rejected before they are decoded
+    max_pixels: Optional[int] = 100_000_000
+    # Peak bytes one image may take once decoded (after JPEG draft downscaling)
+    memory_budget: Optional[int] = 256 * 1024 * 1024
+
+
+class ImageTooLarge(ValueError):
+    """Raised for images over the `max_pixels` or `memory_budget` limits."""
+
+
+@dataclass
+class ImageInfo:
+    """What `compress_image` wrote: the main image and the width of each variant."""
+
+    width: int
+    height: int
+    bytes: int
+    variants: Dict[str, int] = field(default_factory=dict)
+    # Tiny blurred preview as a JPEG data URL, and the most common colour as #rrggbb
+    placeholder: Optional[str] = None
+    dominant_color: Optional[str] = None
+
+
+def parse_variants(spec: Optional[str]) -> Dict[str, int]:
+    """Parse a variant spec such as ``"thumb:320,medium:800"`` into ``{name: max_dim}``."""
+
+    variants: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, dim = item.partition(":")
+        if not name.isalnum() or not dim.isdigit():
+            raise ValueError(f"Invalid image variant {item!r}; expected name:max_dim")
+        variants[name] = int(dim)
+    return variants
+
+
+def variant_path(path: Path, name: str) -> Path:
+    """Path of the `name` size variant of `path`, e.g. ``photo.jpg`` → ``photo.thumb.jpg``."""
+
+    return path.with_name(f"{path.stem}.{name}{path.suffix}")
+
+
+def format_path(path: Path, name: str) -> Path:
+    """Path of the `name` encoding of `path`, e.g. ``photo.jpg`` → ``photo.webp``."""
+
+    return path.with_suffix(OUTPUT_FORMATS[name].suffix)
+
+
+def derived_paths(path: Path, options: OptimizeOptions) -> List[Path]:
+    """Every extra file `compress_image` writes next to `path`: alternate encodings and size variants."""
+
+    bases = [path] + [variant_path(path, name) for name in options.variants or {}]
+    paths = []
+    for base in bases:
+        if base != path:
+            paths.append(base)
+        paths.extend(format_path(base, fmt) for fmt in options.alternate_formats or [])
+    return [extra for extra in paths if extra != path]
 
 
 def setup_logging(level: int = logging.INFO) -> None:
@@ -75,7 +211,165 @@ def _resize_if_needed(img: Image.Image, max_dim: Optional[int]) -> Image.Image:
 
     scale = max_dim / float(longest)
     new_size = (int(width * scale), int(height * scale))
-    return img.resize(new_size, Image.LANCZOS)
+    # reducing_gap box-reduces by an integer factor first, so LANCZOS only
+    # runs over roughly 3x the target size instead of the full image.
+    return img.resize(new_size, _pillow().LANCZOS, reducing_gap=3.0)
+
+
+def _to_encodable(img: Image.Image) -> Image.Image:
+    """Convert `img` to RGB, or L for greyscale, which every output format can encode."""
+
+    if img.mode in ("RGB", "L"):
+        return img
+    if img.mode == "I" or img.mode.startswith("I;16"):
+        # 16-bit greyscale: scale to 8 bits instead of clipping everything over 255 to white
+        return img.convert("I").point(lambda value: value / 256).convert("L")
+    if img.mode == "LA":
+        return img.convert("L")
+    return img.convert("RGB")
+
+
+def _draft_for(img: Image.Image, max_dim: Optional[int]) -> None:
+    """
+    Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding, keeping
+    the longest side at least `max_dim`. A no-op for other formats.
+    """
+
+    if not max_dim:
+        return
+
+    width, height = img.size
+    longest = max(width, height)
+    if longest <= max_dim:
+        return
+
+    scale = max_dim / float(longest)
+    img.draft(img.mode, (math.ceil(width * scale), math.ceil(height * scale)))
+
+
+def prepare_image(img: Image.Image, options: OptimizeOptions) -> None:
+    """
+    Check an opened (not yet decoded) image against the size limits and
+    set up draft decoding. Only the header has been read at this point,
+    so oversized inputs are rejected before any pixel memory is used.
+
+    Raises `ImageTooLarge`.
+    """
+
+    width, height = img.size
+    if options.max_pixels and width * height > options.max_pixels:
+        raise ImageTooLarge(f"Image is {width}x{height}; the limit is {options.max_pixels:,} pixels")
+
+    _draft_for(img, options.max_dim)
+
+    if options.memory_budget:
+        # Pillow stores RGB(A) pixels in 4 bytes; a mode conversion holds a second copy
+        width, height = img.size
+        needed = width * height * 4 * (1 if img.mode in ("RGB", "L") else 2)
+        if needed > options.memory_budget:
+            raise ImageTooLarge(
+                f"Image is {width}x{height}; decoding it needs about {needed // 2**20} MB "
+                f"(budget {options.memory_budget // 2**20} MB)"
+            )
+
+
+def check_image_file(fp, options: Optional[OptimizeOptions] = None) -> Optional[str]:
+    """
+    Reject an oversized image from its header alone, then rewind `fp`.
+
+    Returns the extension matching the image's actual format (``.png``),
+    or None for files Pillow cannot identify; they pass through and
+    `compress_image` copies them. Raises `ImageTooLarge`.
+    """
+
+    if options is None:
+        options = OptimizeOptions()
+
+    Image = _pillow()
+    try:
+        with Image.open(fp) as img:
+            prepare_image(img, options)
+            return FORMAT_SUFFIXES.get(img.format) or next(
+                (ext for ext, fmt in Image.registered_extensions().items() if fmt == img.format), None
+            )
+    except Image.UnidentifiedImageError:
+        return None
+    except Image.DecompressionBombError as exc:
+        raise ImageTooLarge(str(exc)) from exc
+    finally:
+        fp.seek(0)
+
+
+def _save(img: Image.Image, dst: Path, fmt: str, options: OptimizeOptions) -> None:
+    """Encode `img` into `dst` as `fmt`, using the format's preset quality unless one is set."""
+
+    spec = OUTPUT_FORMATS[fmt]
+    quality = options.quality if options.quality is not None else spec.quality
+    img.save(dst, spec.pil_format, quality=quality, **spec.params)
+
+
+def _save_derived(img: Image.Image, dst: Path, fmt: str, options: OptimizeOptions) -> None:
+    """Save a variant or alternate encoding atomically so it is never served half-written."""
+
+    temp_path = dst.with_suffix(dst.suffix + ".tmp")
+    _save(img, temp_path, fmt, options)
+    os.replace(temp_path, dst)
+
+
+def _save_alternates(img: Image.Image, path: Path, options: OptimizeOptions) -> None:
+    for fmt in options.alternate_formats or []:
+        alternate_path = format_path(path, fmt)
+        if alternate_path != path:
+            _save_derived(img, alternate_path, fmt, options)
+
+
+def make_placeholder(img: Image.Image) -> Tuple[str, str]:
+    """
+    Return `(data_url, dominant_color)` for `img`: a JPEG at most
+    `PLACEHOLDER_SIZE` pixels on its longest side, and the most common
+    colour of that thumbnail as ``#rrggbb``.
+    """
+
+    # JPEG and quantize() both need RGB; CMYK, alpha and 16-bit inputs would fail here
+    tiny = img.convert("RGB")
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), _pillow().Resampling.BOX)
+
+    buffer = io.BytesIO()
+    tiny.save(buffer, "JPEG", quality=PLACEHOLDER_QUALITY, optimize=True)
+    data_url = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    # Quantize to a few colours so near-identical pixels count as one
+    quantized = tiny.quantize(colors=4)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return data_url, f"#{r:02x}{g:02x}{b:02x}"
+
+
+def read_image_info(path: Path) -> Optional[ImageInfo]:
+    """
+    Describe an image already on disk without re-encoding it: its size,
+    file size, placeholder and dominant colour. Returns None for files
+    Pillow cannot read.
+    """
+
+    Image = _pillow()
+    path = Path(path)
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            # JPEGs decode at a fraction of their size, which is all the placeholder needs
+            img.draft("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+            placeholder, dominant_color = make_placeholder(img)
+    except OSError as exc:
+        logging.warning("Cannot read image %s: %s", path, exc)
+        return None
+    return ImageInfo(
+        width=width,
+        height=height,
+        bytes=path.stat().st_size,
+        placeholder=placeholder,
+        dominant_color=dominant_color,
+    )
 
 
 def compress_image(
@@ -83,64 +377,104 @@ def compress_image(
     dst: Path,
     *,
     options: Optional[OptimizeOptions] = None,
-) -> None:
+    variant_base: Optional[Path] = None,
+) -> Optional[ImageInfo]:
     """
     Compress a single image from `src` into `dst`.
 
-    - Converts non-RGB images to RGB.
-    - Optionally resizes based on `max_dim`.
-    - Saves as JPEG with configurable quality/optimization.
+    - Rejects inputs over `max_pixels` / `memory_budget` with `ImageTooLarge`.
+    - Converts every mode other than RGB and L (CMYK, alpha, palette,
+      16-bit) to one of them.
+    - Optionally resizes based on `max_dim`, letting the JPEG decoder do
+      most of the downscaling.
+    - Saves in `options.output_format` (JPEG by default).
+    - Writes each of `options.alternate_formats` and `options.variants`
+      next to `variant_base` (default `dst`), reusing the decoded image.
+    - Computes a placeholder and dominant colour from the smallest
+      resized copy, so they cost no extra decode.
+
+    Returns the `ImageInfo` of the written image, or None if Pillow could
+    not identify `src` and it was copied unchanged. Any other failure is
+    raised, so callers never mistake an unconverted copy for output.
     """
 
     if options is None:
         options = OptimizeOptions()
 
+    Image = _pillow()
     try:
         with Image.open(src) as img:
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
+            prepare_image(img, options)
+            img = _to_encodable(img)
 
             img = _resize_if_needed(img, options.max_dim)
 
-            # Always save as JPEG for good compression; the extension of `dst`
-            # determines how the URL will look but the content will be JPEG.
+            # Callers name `dst` with the suffix of `options.output_format`
+            # (see `format_path`) so the extension matches the content.
             ensure_dir(dst.parent)
-            img.save(
-                dst,
-                "JPEG",
-                quality=options.quality,
-                optimize=True,
-            )
+            _save(img, dst, options.output_format, options)
+            info = ImageInfo(width=img.width, height=img.height, bytes=dst.stat().st_size)
+            base = variant_base or dst
+            _save_alternates(img, base, options)
+
+            # Chain smaller sizes off the previous one, largest first, so the
+            # source is decoded once and each resize works on fewer pixels.
+            variants = sorted((options.variants or {}).items(), key=lambda item: item[1], reverse=True)
+            for name, variant_dim in variants:
+                img = _resize_if_needed(img, variant_dim)
+                _save_derived(img, variant_path(base, name), options.output_format, options)
+                _save_alternates(img, variant_path(base, name), options)
+                info.variants[name] = img.width
+
+            try:
+                info.placeholder, info.dominant_color = make_placeholder(img)
+            except Exception as exc:
+                # The optimized files are written; keep their size and variants without a placeholder
+                logging.warning("No placeholder for %s: %s", src.name, exc)
 
         logging.info("Compressed %s → %s", src.name, dst.name)
+        return info
 
-    except UnidentifiedImageError:
+    except Image.UnidentifiedImageError:
         # If Pillow cannot open the file, copy it unchanged so we don't lose data
         ensure_dir(dst.parent)
         dst.write_bytes(src.read_bytes())
         logging.info("Copied unsupported %s", src.name)
-    except Exception as exc:  # pragma: no cover - defensive logging
-        logging.error("Failed to compress %s: %s", src, exc)
+    except Image.DecompressionBombError as exc:
+        raise ImageTooLarge(str(exc)) from exc
 
 
 def optimize_image_file_in_place(
     path: str | Path,
     *,
-    quality: int = 85,
+    dst: Optional[str | Path] = None,
+    quality: Optional[int] = None,
     max_dim: Optional[int] = 1600,
-) -> None:
+    variants: Optional[Dict[str, int]] = None,
+    output_format: str = "jpeg",
+    alternate_formats: Optional[List[str]] = None,
+    max_pixels: Optional[int] = 100_000_000,
+    memory_budget: Optional[int] = 256 * 1024 * 1024,
+) -> Optional[ImageInfo]:
     """
-    Optimize an image file on disk, replacing it in place.
+    Optimize an image file on disk, replacing it in place, or moving the
+    result to `dst` when the original was kept under another name (its
+    source format's extension).
 
     Used by the Flask upload endpoint so that every stored upload
-    is automatically compressed after it is written to disk.
+    is automatically compressed after it is written to disk. Any
+    `variants` and `alternate_formats` are written alongside the result
+    (see `derived_paths`). Raises `ImageTooLarge` for oversized images, and
+    whatever else stopped the encode, leaving the original untouched. Returns the `ImageInfo` of the
+    optimized file, or None if it was left as it was.
     """
 
     src_path = Path(path)
+    dst_path = Path(dst) if dst is not None else src_path
 
     if not src_path.exists() or not src_path.is_file():
         logging.warning("optimize_image_file_in_place: %s does not exist", src_path)
-        return
+        return None
 
     ext = src_path.suffix.lower()
     if ext not in SUPPORTED_EXTENSIONS:
@@ -150,18 +484,33 @@ def optimize_image_file_in_place(
             src_path.name,
             ext,
         )
-        return
+        return None
 
     # We write to a temporary path and then move over the original
-    temp_path = src_path.with_suffix(src_path.suffix + ".opt-tmp")
-
-    options = OptimizeOptions(quality=quality, max_dim=max_dim)
-    compress_image(src_path, temp_path, options=options)
+    temp_path = dst_path.with_suffix(dst_path.suffix + ".opt-tmp")
+
+    options = OptimizeOptions(
+        quality=quality,
+        max_dim=max_dim,
+        variants=variants,
+        output_format=output_format,
+        alternate_formats=alternate_formats,
+        max_pixels=max_pixels,
+        memory_budget=memory_budget,
+    )
+    try:
+        info = compress_image(src_path, temp_path, options=options, variant_base=dst_path)
+    except Exception:
+        # The original stays in place; only the half-written copy goes
+        temp_path.unlink(missing_ok=True)
+        raise
 
     # Swap the optimized file into place
     try:
-        os.replace(temp_path, src_path)
-        logging.info("Optimized upload in place: %s", src_path.name)
+        os.replace(temp_path, dst_path)
+        if dst_path != src_path:
+            src_path.unlink()
+        logging.info("Optimized upload in place: %s", dst_path.name)
     except Exception as exc:  # pragma: no cover - defensive logging
         logging.error("Failed to replace original image %s: %s", src_path, exc)
         # If replacement fails, attempt to clean up the temp file
@@ -170,6 +519,8 @@ def optimize_image_file_in_place(
                 temp_path.unlink()
             except OSError:
                 pass
+        return None
+    return info
 
 
 def iter_files(root: Path) -> Iterable[Path]:
@@ -180,30 +531,348 @@ def iter_files(root: Path) -> Iterable[Path]:
             yield path
 
 
+@dataclass
+class TreeStats:
+    """Counters collected while processing a directory tree."""
+
+    total: int = 0
+    compressed: int = 0
+    copied: int = 0
+    skipped: int = 0
+    failed: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def done(self) -> int:
+        return self.compressed + self.copied + self.skipped + self.failed
+
+    def summary(self) -> str:
+        """Human-readable throughput report for the end of a run."""
+
+        elapsed = max(self.elapsed, 1e-9)
+        saved = self.bytes_in - self.bytes_out
+        saved_pct = (saved / self.bytes_in * 100) if self.bytes_in else 0.0
+        return (
+            f"{self.done} files ({self.compressed} compressed, {self.copied} copied, "
+            f"{self.skipped} unchanged, {self.failed} failed) "
+            f"in {self.elapsed:.1f}s: {self.done / elapsed:.1f} files/s, "
+            f"{self.bytes_in / elapsed / 1_000_000:.1f} MB/s in; "
+            f"{self.bytes_in / 1_000_000:.1f} MB → {self.bytes_out / 1_000_000:.1f} MB "
+            f"({saved_pct:.0f}% saved)"
+        )
+
+
+MANIFEST_NAME = ".image-manifest.json"
+
+
+def _options_key(options: OptimizeOptions) -> dict:
+    """`options` as it reads back from the manifest JSON, so the two compare equal."""
+
+    return json.loads(json.dumps(asdict(options)))
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's contents, read in chunks."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class Manifest:
+    """
+    Record of what a previous run produced, keyed by source path relative
+    to the input root.
+
+    Each entry keeps the source size, mtime and SHA-256 plus the
+    `OptimizeOptions` used, so a re-run can skip files whose content and
+    options are unchanged. Size and mtime are checked first; the content
+    hash is only computed when they differ (e.g. after a copy or touch).
+    """
+
+    path: Path
+    entries: Dict[str, dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "Manifest":
+        try:
+            data = json.loads(path.read_text())
+            entries = data.get("entries", {})
+        except (OSError, ValueError):
+            entries = {}
+        return cls(path=path, entries=entries)
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+
+        ensure_dir(self.path.parent)
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        temp_path.write_text(json.dumps({"version": 1, "entries": self.entries}, indent=1, sort_keys=True))
+        os.replace(temp_path, self.path)
+
+    def classify(self, rel: str, src_path: Path, dst_path: Path, options: OptimizeOptions) -> str:
+        """
+        Decide what to do with one source file: `new`, `changed`,
+        `options` (same content, different options), `missing` (output
+        gone) or `unchanged`.
+        """
+
+        entry = self.entries.get(rel)
+        if entry is None:
+            return "new"
+        if not dst_path.exists():
+            return "missing"
+        if entry.get("options") != _options_key(options):
+            return "options"
+
+        stat = src_path.stat()
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return "unchanged"
+        if entry.get("size") == stat.st_size and entry.get("sha256") == file_digest(src_path):
+            # Same bytes with a new mtime: remember the new stat so the next run stays cheap
+            entry["mtime_ns"] = stat.st_mtime_ns
+            return "unchanged"
+        return "changed"
+
+    def record(self, rel: str, src_path: Path, digest: str, options: OptimizeOptions, bytes_out: int) -> None:
+        stat = src_path.stat()
+        self.entries[rel] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "options": _options_key(options),
+            "output_size": bytes_out,
+        }
+
+    def prune(self, keep: Iterable[str]) -> None:
+        """Forget sources that no longer exist."""
+
+        keep = set(keep)
+        for rel in list(self.entries):
+            if rel not in keep:
+                del self.entries[rel]
+
+
+def _zip_compress_type(path: Path) -> int:
+    """Store already-compressed images as-is; deflating them only burns CPU."""
+
+    if path.suffix.lower() in SUPPORTED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _process_file(
+    src_path: Path,
+    dst_path: Path,
+    options: OptimizeOptions,
+) -> Tuple[Path, str, int, int, str]:
+    """
+    Optimize or copy one file.
+
+    Returns `(dst_path, outcome, bytes_in, bytes_out, sha256)`, where
+    `outcome` is `compressed`, `copied` or `failed`. Kept at module level
+    so it can be shipped to worker processes.
+    """
+
+    digest = file_digest(src_path)
+
+    if src_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+        outcome = "compressed"
+        try:
+            compress_image(src_path, dst_path, options=options)
+        except Exception as exc:
+            # One bad file should not stop the whole batch; drop any partial output
+            logging.error("Failed to compress %s: %s", src_path, exc)
+            dst_path.unlink(missing_ok=True)
+            outcome = "failed"
+    else:
+        outcome = "copied"
+        ensure_dir(dst_path.parent)
+        dst_path.write_bytes(src_path.read_bytes())
+        logging.info("Copied %s", src_path.name)
+
+    bytes_out = dst_path.stat().st_size if dst_path.exists() else 0
+    return dst_path, outcome, src_path.stat().st_size, bytes_out, digest
+
+
+def output_paths(
+    in_root: Path,
+    out_root: Path,
+    sources: Iterable[Path],
+    options: OptimizeOptions,
+) -> Dict[Path, Path]:
+    """
+    Map each source file to its path under `out_root`.
+
+    Images take the suffix of `options.output_format` so the extension
+    matches the content. When that would make two sources collide
+    (``a.jpg`` and ``a.png``), the later one keeps its full name
+    (``a.png.jpg``). Other files keep their name.
+    """
+
+    suffix = OUTPUT_FORMATS[options.output_format].suffix
+    paths: Dict[Path, Path] = {}
+    taken = set()
+    for src_path in sorted(sources):
+        dst_path = out_root / src_path.relative_to(in_root)
+        if src_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            renamed = dst_path.with_suffix(suffix)
+            dst_path = renamed if renamed not in taken else dst_path.with_name(dst_path.name + suffix)
+        taken.add(dst_path)
+        paths[src_path] = dst_path
+    return paths
+
+
+def plan_tree(
+    in_root: Path,
+    out_root: Path,
+    *,
+    options: Optional[OptimizeOptions] = None,
+    manifest: Optional[Manifest] = None,
+) -> List[Tuple[Path, Path, str]]:
+    """
+    List every source file under `in_root` with its output path and the
+    reason it needs work (`new`, `changed`, `options`, `missing`) or
+    `unchanged`.
+
+    Without a manifest every file is `new`.
+    """
+
+    if options is None:
+        options = OptimizeOptions()
+
+    plan = []
+    for src_path, dst_path in output_paths(in_root, out_root, iter_files(in_root), options).items():
+        if manifest is None:
+            plan.append((src_path, dst_path, "new"))
+        else:
+            rel = src_path.relative_to(in_root).as_posix()
+            plan.append((src_path, dst_path, manifest.classify(rel, src_path, dst_path, options)))
+    return plan
+
+
 def process_tree(
     in_root: Path,
     out_root: Path,
     *,
     options: Optional[OptimizeOptions] = None,
-) -> None:
+    jobs: int = 1,
+    zip_path: Optional[Path] = None,
+    manifest: Optional[Manifest] = None,
+    progress_every: float = 5.0,
+) -> TreeStats:
     """
     Walk a directory tree and optimize supported images into `out_root`,
     copying non-image files unchanged.
+
+    With `jobs > 1` files are processed on a pool of worker processes.
+    When `zip_path` is given, each finished file is added to the archive
+    as soon as it completes instead of re-walking `out_root` afterwards.
+    With a `manifest`, files whose content and options are unchanged since
+    the last run are skipped (but still added to the archive), and the
+    manifest is saved at the end. Progress is logged every `progress_every`
+    seconds.
     """
 
     if options is None:
         options = OptimizeOptions()
 
-    for src_path in iter_files(in_root):
-        rel_path = src_path.relative_to(in_root)
-        dst_path = out_root / rel_path
+    plan = plan_tree(in_root, out_root, options=options, manifest=manifest)
+    dst_paths = {src_path: dst_path for src_path, dst_path, _ in plan}
+    sources = [src_path for src_path, _, reason in plan if reason != "unchanged"]
+    unchanged = [src_path for src_path, _, reason in plan if reason == "unchanged"]
+    stats = TreeStats(total=len(plan))
+    started = time.monotonic()
+    last_report = started
+
+    zf = None
+    if zip_path:
+        ensure_dir(zip_path.parent)
+        zf = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED)
+
+    def dst_for(src_path: Path) -> Path:
+        return dst_paths[src_path]
+
+    def add_to_zip(dst_path: Path) -> None:
+        if zf is None:
+            return
+        for path in [dst_path] + derived_paths(dst_path, options):
+            if path.exists():
+                zf.write(path, path.relative_to(out_root), compress_type=_zip_compress_type(path))
+
+    def record(src_path: Path, result: Tuple[Path, str, int, int, str]) -> None:
+        nonlocal last_report
+        dst_path, outcome, bytes_in, bytes_out, digest = result
+        rel = src_path.relative_to(in_root).as_posix()
+        if outcome == "failed":
+            # Left out of the manifest so the next run retries it
+            stats.failed += 1
+            if manifest is not None:
+                manifest.entries.pop(rel, None)
+        else:
+            if outcome == "compressed":
+                stats.compressed += 1
+            else:
+                stats.copied += 1
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            if manifest is not None:
+                manifest.record(rel, src_path, digest, options, bytes_out)
+            add_to_zip(dst_path)
+
+        now = time.monotonic()
+        if now - last_report >= progress_every:
+            last_report = now
+            logging.info(
+                "Progress: %d/%d files (%.0f%%), %.1f files/s",
+                stats.done,
+                stats.total,
+                stats.done / stats.total * 100,
+                stats.done / (now - started),
+            )
 
-        if src_path.suffix.lower() in SUPPORTED_EXTENSIONS:
-            compress_image(src_path, dst_path, options=options)
+    try:
+        for src_path in unchanged:
+            stats.skipped += 1
+            add_to_zip(dst_for(src_path))
+
+        if jobs <= 1:
+            for src_path in sources:
+                record(src_path, _process_file(src_path, dst_for(src_path), options))
         else:
-            ensure_dir(dst_path.parent)
-            dst_path.write_bytes(src_path.read_bytes())
-            logging.info("Copied %s", src_path.name)
+            # Keep a bounded number of files in flight so huge trees don't queue
+            # every task up front.
+            max_in_flight = jobs * 4
+            pending_sources = iter(sources)
+            in_flight = {}
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                while True:
+                    for src_path in pending_sources:
+                        future = executor.submit(_process_file, src_path, dst_for(src_path), options)
+                        in_flight[future] = src_path
+                        if len(in_flight) >= max_in_flight:
+                            break
+                    if not in_flight:
+                        break
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record(in_flight.pop(future), future.result())
+    finally:
+        if zf is not None:
+            zf.close()
+            logging.info("Created zip archive %s", zip_path)
+        if manifest is not None:
+            # Saved even after a failure so finished files are not redone next run
+            manifest.prune(src_path.relative_to(in_root).as_posix() for src_path in dst_paths)
+            manifest.save()
+
+    stats.elapsed = time.monotonic() - started
+    return stats
 
 
 def create_zip(source_dir: Path, zip_path: Path) -> None:
@@ -212,8 +881,10 @@ def create_zip(source_dir: Path, zip_path: Path) -> None:
     ensure_dir(zip_path.parent)
     with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
         for file_path in iter_files(source_dir):
+            if file_path.name == MANIFEST_NAME:
+                continue
             arcname = file_path.relative_to(source_dir)
-            zf.write(file_path, arcname)
+            zf.write(file_path, arcname, compress_type=_zip_compress_type(file_path))
 
     logging.info("Created zip archive %s", zip_path)
 
@@ -248,8 +919,21 @@ def _parse_args(argv: Optional[Iterable[str]] = None):
     parser.add_argument(
         "--quality",
         type=int,
-        default=85,
-        help="JPEG quality (1-100), higher means larger files",
+        default=None,
+        help="Encoder quality (1-100), higher means larger files; defaults to a per-format preset",
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=sorted(OUTPUT_FORMATS),
+        default="jpeg",
+        help="Format to re-encode images into",
+    )
+    parser.add_argument(
+        "--alternate-formats",
+        type=parse_formats,
+        default=None,
+        help="Extra encodings to write next to each image, e.g. webp,avif",
     )
     parser.add_argument(
         "--max-dim",
@@ -257,6 +941,47 @@ def _parse_args(argv: Optional[Iterable[str]] = None):
         default=1600,
         help="Resize larger side to this value, keep aspect ratio",
     )
+    parser.add_argument(
+        "--max-pixels",
+        type=int,
+        default=OptimizeOptions.max_pixels,
+        help="Skip images with more pixels than this (decompression-bomb guard)",
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=int,
+        default=OptimizeOptions.memory_budget // 2**20,
+        help="Skip images that would take more than this many MB once decoded",
+    )
+    parser.add_argument(
+        "--variants",
+        type=parse_variants,
+        default=None,
+        help="Extra sizes to write next to each image, e.g. thumb:320,medium:800",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=None,
+        help=f"Manifest of previous runs (default: OUTPUT_DIR/{MANIFEST_NAME})",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the manifest and reprocess every file",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report which files would be processed, without writing anything",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 means one per CPU core)",
+    )
 
     return parser.parse_args(list(argv) if argv is not None else None)
 
@@ -271,15 +996,55 @@ def main(argv: Optional[Iterable[str]] = None) -> int:
         logging.error("Input directory does not exist: %s", args.input_dir)
         return 1
 
-    ensure_dir(args.output_dir)
-    options = OptimizeOptions(quality=args.quality, max_dim=args.max_dim)
-
-    process_tree(args.input_dir, args.output_dir, options=options)
+    for fmt in [args.output_format] + (args.alternate_formats or []):
+        if not format_supported(fmt):
+            logging.error("This Pillow build cannot write %s images", fmt)
+            return 1
+
+    options = OptimizeOptions(
+        quality=args.quality,
+        max_dim=args.max_dim,
+        variants=args.variants or None,
+        output_format=args.output_format,
+        alternate_formats=args.alternate_formats or None,
+        max_pixels=args.max_pixels or None,
+        memory_budget=args.memory_budget_mb * 2**20 or None,
+    )
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    manifest_path = args.manifest or args.output_dir / MANIFEST_NAME
+    manifest = Manifest.load(manifest_path)
+    if args.force:
+        manifest.entries.clear()
+
+    if args.dry_run:
+        plan = plan_tree(args.input_dir, args.output_dir, options=options, manifest=manifest)
+        counts: Dict[str, int] = {}
+        for src_path, _, reason in plan:
+            counts[reason] = counts.get(reason, 0) + 1
+            if reason != "unchanged":
+                logging.info("Pending (%s): %s", reason, src_path.relative_to(args.input_dir))
+        pending = len(plan) - counts.get("unchanged", 0)
+        logging.info(
+            "Dry run: %d of %d files pending (%s)",
+            pending,
+            len(plan),
+            ", ".join(f"{reason}: {count}" for reason, count in sorted(counts.items())),
+        )
+        return 0
 
-    if args.zip_path:
-        create_zip(args.output_dir, args.zip_path)
+    ensure_dir(args.output_dir)
+    stats = process_tree(
+        args.input_dir,
+        args.output_dir,
+        options=options,
+        jobs=jobs,
+        zip_path=args.zip_path,
+        manifest=manifest,
+    )
+    logging.info("Done: %s", stats.summary())
 
-    return 0
+    return 1 if stats.failed else 0
 
 
 if __name__ == "__main__":  # pragma: no cover - manual CLI use
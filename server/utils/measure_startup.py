@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Measure how long a Still Strava worker takes to boot.
+
+Times fresh interpreters, as gunicorn workers would start them, in two
+modes:
+
+- `import`: import the app, as a worker does now.
+- `import+migrate`: import the app and run the Alembic upgrade check,
+  as every worker used to on import.
+
+The database is migrated once before timing, so `import+migrate`
+measures the no-op check each worker paid on every boot. Run from
+server/:
+
+    python utils/measure_startup.py --runs 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+MODES: Dict[str, str] = {
+    "import": "import app",
+    "import+migrate": "import app; from release import run_migrations; run_migrations()",
+}
+
+
+def time_boot(code: str, env: Dict[str, str]) -> float:
+    """Seconds for a fresh interpreter to run `code` in server/."""
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Time worker boot with and without the import-time migration.")
+    parser.add_argument("--runs", type=int, default=10, help="Boots timed per mode (default: 10)")
+    parser.add_argument("--database-url", help="Database to use instead of a fresh SQLite file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="startup-") as scratch:
+        env = dict(os.environ)
+        env["DATABASE_URL"] = args.database_url or f"sqlite:///{scratch}/startup.db"
+        env["MIGRATE_ON_STARTUP"] = "false"
+        subprocess.run([sys.executable, "-m", "flask", "--app", "app", "db", "upgrade"],
+                       cwd=SERVER_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # One untimed boot per mode so both start with warm bytecode and disk caches
+        for code in MODES.values():
+            time_boot(code, env)
+
+        for mode, code in MODES.items():
+            timings = [time_boot(code, env) for _ in range(args.runs)]
+            print(
+                f"{mode:15} median {statistics.median(timings) * 1000:7.1f} ms  "
+                f"min {min(timings) * 1000:7.1f} ms  max {max(timings) * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
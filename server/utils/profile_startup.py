@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+"""
+Profile where a Still Strava worker's boot time goes.
+
+Prints two reports, each from fresh interpreters started the way a
+gunicorn worker imports the app:
+
+- Phases: the import broken into steps (Flask and the extensions in
+  config.py, the models, SQLAlchemy mapper configuration, each service
+  module, then app.py's own route and resource registration), median
+  of `--runs` boots.
+- Imports: `python -X importtime -c "import app"`, summed per top-level
+  package and listed for the slowest individual modules.
+
+Pillow, Alembic and boto3 are only imported by the code paths that use
+them. If one of them shows up at boot the report says where it came
+from and the script exits with status 1. Run from server/:
+
+    python utils/profile_startup.py --runs 5 --top 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# Imported in this order, so each step only pays for what earlier steps did not load
+SERVICE_MODULES = (
+    "storage",
+    "passwords",
+    "db_pool",
+    "timeline",
+    "search",
+    "autocomplete",
+    "image_jobs",
+    "uploads",
+    "release",
+)
+
+# Heavy modules web workers should not import at boot
+LAZY_MODULES = ("PIL", "alembic", "flask_migrate", "boto3", "botocore")
+
+
+@dataclass
+class ImportRecord:
+    """One line of `-X importtime` output, in microseconds."""
+
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure_phases() -> List[Tuple[str, float]]:
+    """Import the app step by step in this interpreter and return (phase, seconds) pairs."""
+
+    sys.path.insert(0, str(SERVER_DIR))
+    phases: List[Tuple[str, float]] = []
+
+    def timed(name, func):
+        start = time.perf_counter()
+        func()
+        phases.append((name, time.perf_counter() - start))
+
+    timed("config (Flask, extensions)", lambda: __import__("config"))
+    timed("models", lambda: __import__("models"))
+
+    from sqlalchemy.orm import configure_mappers
+    timed("mapper configuration", configure_mappers)
+
+    for module in SERVICE_MODULES:
+        timed(module, lambda module=module: __import__(module))
+
+    # Route and resource registration both end in Flask.add_url_rule
+    from flask import Flask
+    registration = [0.0]
+    add_url_rule = Flask.add_url_rule
+
+    def timed_add_url_rule(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return add_url_rule(self, *args, **kwargs)
+        finally:
+            registration[0] += time.perf_counter() - start
+
+    Flask.add_url_rule = timed_add_url_rule
+    try:
+        timed("app", lambda: __import__("app"))
+    finally:
+        Flask.add_url_rule = add_url_rule
+
+    _, total = phases.pop()
+    phases.append(("app: route and resource registration", registration[0]))
+    phases.append(("app: everything else", total - registration[0]))
+    return phases
+
+
+def run_phases(env: Dict[str, str]) -> List[Tuple[str, float]]:
+    """Measure the phases in a fresh interpreter."""
+
+    result = subprocess.run([sys.executable, __file__, "--phases-json"], cwd=SERVER_DIR, env=env,
+                            check=True, capture_output=True, text=True)
+    return [tuple(phase) for phase in json.loads(result.stdout)]
+
+
+def time_interpreter(env: Dict[str, str]) -> float:
+    """Seconds for a bare interpreter to start and exit, the floor under every boot."""
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], cwd=SERVER_DIR, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def run_importtime(env: Dict[str, str]) -> List[ImportRecord]:
+    """Import the app under `-X importtime` and parse the report from stderr."""
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=SERVER_DIR,
+                            env=env, check=True, capture_output=True, text=True)
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append(ImportRecord(name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def importer_chain(records: List[ImportRecord], index: int) -> List[str]:
+    """Names of the modules whose import pulled in `records[index]`, outermost first."""
+
+    # importtime prints a module after its children, so parents come later at a lower depth
+    chain = []
+    depth = records[index].depth
+    for record in records[index + 1:]:
+        if record.depth < depth:
+            chain.append(record.name)
+            depth = record.depth
+    return list(reversed(chain))
+
+
+def print_phases(phases: List[Tuple[str, float]], interpreter: float) -> None:
+    total = interpreter + sum(seconds for _, seconds in phases)
+    print("Phases (median per boot)")
+    for name, seconds in [("interpreter startup", interpreter)] + phases:
+        print(f"  {name:40} {seconds * 1000:7.1f} ms  {seconds / total:6.1%}")
+    print(f"  {'total':40} {total * 1000:7.1f} ms")
+
+
+def print_imports(records: List[ImportRecord], top: int) -> None:
+    by_package: Dict[str, int] = defaultdict(int)
+    for record in records:
+        by_package[record.name.split(".")[0]] += record.self_us
+
+    print(f"\nImports by top-level package (top {top})")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:40} {self_us / 1000:7.1f} ms")
+
+    print(f"\nSlowest modules by own import time (top {top})")
+    for record in sorted(records, key=lambda record: record.self_us, reverse=True)[:top]:
+        print(f"  {record.name:40} {record.self_us / 1000:7.1f} ms  (with imports {record.cumulative_us / 1000:.1f} ms)")
+
+
+def check_lazy_modules(records: List[ImportRecord]) -> bool:
+    """Report heavy modules imported at boot; return True if there were none."""
+
+    clean = True
+    for index, record in enumerate(records):
+        if record.name in LAZY_MODULES:
+            clean = False
+            chain = " -> ".join(importer_chain(records, index) + [record.name])
+            print(f"\n{record.name} is imported at boot ({record.cumulative_us / 1000:.1f} ms): {chain}")
+    return clean
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Break down how long importing the app takes.")
+    parser.add_argument("--runs", type=int, default=5, help="Boots timed for the phase breakdown (default: 5)")
+    parser.add_argument("--top", type=int, default=15, help="Packages and modules listed (default: 15)")
+    parser.add_argument("--database-url", help="Database to use instead of a fresh SQLite file")
+    parser.add_argument("--phases-json", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.phases_json:
+        print(json.dumps(measure_phases()))
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="startup-") as scratch:
+        env = dict(os.environ)
+        env["DATABASE_URL"] = args.database_url or f"sqlite:///{scratch}/startup.db"
+        env["MIGRATE_ON_STARTUP"] = "false"
+        env.pop("FLASK_RUN_FROM_CLI", None)
+
+        # One untimed boot so every run starts with warm bytecode and disk caches
+        run_phases(env)
+
+        runs = [run_phases(env) for _ in range(args.runs)]
+        phases = [(name, statistics.median(run[i][1] for run in runs)) for i, (name, _) in enumerate(runs[0])]
+        interpreter = statistics.median(time_interpreter(env) for _ in range(args.runs))
+        records = run_importtime(env)
+
+    print_phases(phases, interpreter)
+    print_imports(records, args.top)
+    return 0 if check_lazy_modules(records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())